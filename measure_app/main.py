@@ -1,211 +1,1068 @@
 import time
 
 APP_START_TIME = time.time()
-from flask import Flask, request, jsonify
+_IMPORTS_START = time.perf_counter()
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import json
+import itertools
 import threading
-import mysql.connector
+import queue
+import math
+import uuid
+import functools
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+import sqlite3
 import signal
 import sys
 
 from dotenv import load_dotenv
 
+try:
+    import mysql.connector
+except ImportError:  # Only required by the MySQL backend
+    mysql = None
+
+_IMPORTS_END = time.perf_counter()
 load_dotenv()
+_DOTENV_END = time.perf_counter()
 
 
 app = Flask(__name__)
 
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")  # "mysql" or "sqlite"
+DB_NAME = "student_db"
+SQLITE_PATH = os.getenv("SQLITE_PATH", ":memory:")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_PING_IDLE_SEC = float(os.getenv("DB_POOL_PING_IDLE_SEC", 30))  # 0 pings on every checkout
+STUDENT_CACHE_SIZE = int(os.getenv("STUDENT_CACHE_SIZE", 0))  # 0 disables the cache
+STUDENT_CACHE_TTL = float(os.getenv("STUDENT_CACHE_TTL", 30))
+MAX_LOAD_JOBS = int(os.getenv("MAX_LOAD_JOBS", 4))
+MAX_LOAD_CONCURRENCY = int(os.getenv("MAX_LOAD_CONCURRENCY", 64))  # Also capped at DB_POOL_SIZE
+MAX_LOAD_DURATION = float(os.getenv("MAX_LOAD_DURATION", 300))  # Seconds; jobs can't be cancelled
+MAX_LOAD_QPS = float(os.getenv("MAX_LOAD_QPS", 10000))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", 1000))
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 1_000_000))
+SEED_ROWS = int(os.getenv("SEED_ROWS", 20))
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", 5000))
+SEED_COMMIT_EVERY = int(os.getenv("SEED_COMMIT_EVERY", 50000))  # rows per transaction
+DB_SECONDARY_INDEXES = os.getenv("DB_SECONDARY_INDEXES", "0")  # "1" creates, "drop" drops, "0" leaves as is
+SCAN_MODE = os.getenv("SCAN_MODE", "stream")  # "stream" or "buffered"
+SCAN_CHUNK_SIZE = int(os.getenv("SCAN_CHUNK_SIZE", 1000))
+DB_WARMUP = os.getenv("DB_WARMUP", "eager")  # "eager" or "background"
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", 30))
+UPTIME_DELAY_SEC = float(os.getenv("UPTIME_DELAY_SEC", 1))
 
-def setup_database_and_table():
+
+# --- Startup Phases ---
+
+
+def _process_start_time():
     """
-    Connects to MySQL, creates a database if it doesn't exist,
-    and then creates a 'students' table if it doesn't exist.
+    Returns the wall-clock time the interpreter process started, read from
+    /proc so the time spent before APP_START_TIME is visible too.
+    Falls back to APP_START_TIME where /proc is unavailable.
     """
-    db_host = os.getenv("DB_HOST")
-    db_user = os.getenv("DB_USER")
-    db_password = os.getenv("DB_PASSWORD")
-    db_name = "student_db"
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # The command name may contain spaces, so split after its ')'.
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        # starttime counts clock ticks since boot. Measure the process age on
+        # the same clock; /proc/stat's btime only has whole-second precision.
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.time() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return APP_START_TIME
 
-    if not all([db_host, db_user, db_password]):
-        print("Error: Missing required environment variables in .env file.")
-        return
 
-    connection = None
+PROCESS_START_TIME = _process_start_time()
+
+startup_phases = OrderedDict(
+    [
+        ("interpreter", max(0.0, APP_START_TIME - PROCESS_START_TIME)),
+        ("imports", _IMPORTS_END - _IMPORTS_START),
+        ("dotenv", _DOTENV_END - _IMPORTS_END),
+    ]
+)
+_first_request = {}
+_first_request_lock = threading.Lock()
+
+# Cleared while a background warmup is running; DB routes wait on it.
+DB_READY = threading.Event()
+DB_READY.set()
+
+
+@contextmanager
+def startup_phase(name):
+    """Records how long the enclosed block took as a startup phase."""
+    start = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host=db_host, user=db_user, password=db_password
-        )
-        cursor = connection.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
-        print(f"Database '{db_name}' is ready.")
-        connection.database = db_name
-
-        table_name = "students"
-        create_table_query = f"""
-        CREATE TABLE IF NOT EXISTS `{table_name}` (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            email VARCHAR(255) NOT NULL UNIQUE
-        ) ENGINE=InnoDB;
-        """
-        cursor.execute(create_table_query)
-        print(f"Table '{table_name}' is ready.")
-        cursor.close()
-    except mysql.connector.Error as err:
-        print(f"An error occurred during setup: {err}")
+        yield
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        startup_phases[name] = time.perf_counter() - start
 
 
-def insert_sample_data():
-    """Connects to the database and inserts 20 sample students if the table is empty."""
+@app.after_request
+def record_first_request(response):
+    if "success" not in _first_request:
+        with _first_request_lock:
+            now = time.time() - PROCESS_START_TIME
+            _first_request.setdefault("any", now)
+            if response.status_code < 300:
+                _first_request.setdefault("success", now)
+    return response
 
-    db_host = os.getenv("DB_HOST")
-    db_user = os.getenv("DB_USER")
-    db_password = os.getenv("DB_PASSWORD")
-    db_name = "student_db"
 
-    connection = None
-    try:
-        # Connect to the specific database
-        connection = mysql.connector.connect(
-            host=db_host, user=db_user, password=db_password, database=db_name
-        )
-        cursor = connection.cursor()
+def requires_db(view):
+    """Holds a request until the database warmup has finished, or answers 503."""
 
-        # --- Check if the table already has data ---
-        cursor.execute("SELECT COUNT(*) FROM students")
-        (number_of_rows,) = cursor.fetchone()
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not DB_READY.wait(DB_READY_TIMEOUT):
+            return jsonify({"error": "Database warmup still in progress."}), 503
+        return view(*args, **kwargs)
 
-        if number_of_rows > 0:
-            print(
-                "Table 'students' already contains data. Skipping sample data insertion."
-            )
-            return  # Exit the function early
+    return wrapper
 
-        # --- Prepare the sample data if the table is empty ---
-        print("Table is empty. Inserting sample data...")
-        students_to_add = []
-        for i in range(1, 21):
-            name = f"student{i}"
-            email = f"student{i}@gmail.com"
-            students_to_add.append((name, email))
 
-        # --- The SQL query to insert data ---
-        insert_query = "INSERT INTO students (name, email) VALUES (%s, %s)"
+# --- Database Backends ---
 
-        # Use executemany for efficient batch insertion
-        cursor.executemany(insert_query, students_to_add)
 
-        # --- IMPORTANT: Commit the transaction to save changes ---
-        connection.commit()
+class PoolError(Exception):
+    """Raised when the pool cannot hand out a connection."""
 
-        print(f"Successfully inserted {cursor.rowcount} rows of sample data.")
 
-    except mysql.connector.Error as err:
-        print(f"An error occurred while inserting data: {err}")
+class DatabaseBackend(ABC):
+    """
+    Connection handling and SQL dialect of one database engine.
 
-    finally:
-        if connection and connection.is_connected():
+    Queries throughout the app are written with %s placeholders and passed
+    through sql(), so the same statements run on every backend.
+    """
+
+    name = None
+    placeholder = "%s"
+    errors = ()
+    insert_ignore = "INSERT IGNORE"
+    create_table_query = None
+    index_exists_query = None
+    drop_index_query = "DROP INDEX idx_students_name"
+
+    def sql(self, query):
+        if self.placeholder == "%s":
+            return query
+        return query.replace("%s", self.placeholder)
+
+    @abstractmethod
+    def connect(self):
+        """Opens a new connection to the database."""
+
+    @abstractmethod
+    def ping(self, connection):
+        """Raises one of `errors` if the connection can no longer be used."""
+
+    def create_database(self):
+        """Creates the database itself, before any pooled connection is opened."""
+
+    def scan_cursor(self, connection, scan_mode):
+        """Returns a cursor suited to a "stream" or "buffered" full-table scan."""
+        return connection.cursor()
+
+    def row_bytes(self, row):
+        return sum(len(value) for value in row if value is not None)
+
+
+class MySQLBackend(DatabaseBackend):
+    """Remote MySQL server configured by DB_HOST, DB_USER and DB_PASSWORD."""
+
+    name = "mysql"
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS `students` (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE
+    ) ENGINE=InnoDB;
+    """
+    index_exists_query = (
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'students' "
+        "AND index_name = 'idx_students_name'"
+    )
+    drop_index_query = "DROP INDEX idx_students_name ON students"
+
+    def __init__(self):
+        if mysql is None:
+            raise ImportError("DB_BACKEND=mysql requires mysql-connector-python.")
+        self.errors = (mysql.connector.Error,)
+
+    def get_db_config(self):
+        """Reads the MySQL credentials from the environment."""
+        db_host = os.getenv("DB_HOST")
+        db_user = os.getenv("DB_USER")
+        db_password = os.getenv("DB_PASSWORD")
+
+        if not all([db_host, db_user, db_password]):
+            raise PoolError("Missing required environment variables in .env file.")
+        return {"host": db_host, "user": db_user, "password": db_password}
+
+    def connect(self):
+        return mysql.connector.connect(database=DB_NAME, **self.get_db_config())
+
+    def ping(self, connection):
+        # Idle connections may have been dropped by the server.
+        connection.ping(reconnect=True, attempts=1)
+
+    def create_database(self):
+        # Pooled connections are bound to the database, so it is created
+        # over a one-off connection.
+        connection = mysql.connector.connect(**self.get_db_config())
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}`")
             cursor.close()
+        finally:
             connection.close()
-            print("MySQL connection is closed.")
 
+    def scan_cursor(self, connection, scan_mode):
+        # Raw cursors leave values as bytes, so row_bytes() is the payload
+        # received from the server. Unbuffered cursors pull rows off the
+        # socket only as they are fetched.
+        return connection.cursor(buffered=scan_mode != "stream", raw=True)
 
-def background_query_task(duration):
-    """Continuously queries the students table for a given duration using MySQL."""
 
-    db_host = os.getenv("DB_HOST")
-    db_user = os.getenv("DB_USER")
-    db_password = os.getenv("DB_PASSWORD")
-    db_name = "student_db"
+class SQLiteBackend(DatabaseBackend):
+    """
+    Embedded SQLite database at SQLITE_PATH, a file or ":memory:".
 
-    print(
-        f"\n--- Starting background query task for {duration} seconds ---", flush=True
+    An in-memory database is shared by all pooled connections of the
+    process, and kept alive by one extra connection held by the backend.
+    """
+
+    name = "sqlite"
+    placeholder = "?"
+    errors = (sqlite3.Error,)
+    insert_ignore = "INSERT OR IGNORE"
+    create_table_query = """
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE
+    );
+    """
+    index_exists_query = (
+        "SELECT COUNT(*) FROM sqlite_master "
+        "WHERE type = 'index' AND name = 'idx_students_name'"
     )
-    end_time = time.time() + duration
-    query_count = 0
 
-    while time.time() < end_time:
-        connection = None
-        cursor = None
+    def __init__(self, path):
+        self.path = path
+        self._anchor = None
+        if path == ":memory:":
+            self._uri = f"file:{DB_NAME}?mode=memory&cache=shared"
+            self._anchor = self.connect()
+        else:
+            self._uri = None
+
+    def connect(self):
+        if self._uri:
+            return sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        return sqlite3.connect(self.path, timeout=DB_POOL_TIMEOUT, check_same_thread=False)
+
+    def ping(self, connection):
+        connection.execute("SELECT 1")
+
+    def create_database(self):
+        if self._uri is None:
+            connection = self.connect()
+            try:
+                # WAL lets scans run while seeding writes.
+                connection.execute("PRAGMA journal_mode=WAL")
+            finally:
+                connection.close()
+
+    def row_bytes(self, row):
+        return sum(
+            len(value) if isinstance(value, (str, bytes)) else 8
+            for value in row
+            if value is not None
+        )
+
+
+def create_backend(name):
+    if name == "mysql":
+        return MySQLBackend()
+    if name == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown DB_BACKEND '{name}', expected 'mysql' or 'sqlite'.")
+
+
+with startup_phase("db_backend"):
+    db_backend = create_backend(DB_BACKEND)
+DB_ERRORS = (PoolError,) + db_backend.errors
+
+
+# --- Connection Pool ---
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections shared by every route and background task.
+
+    Connections are opened lazily up to `size` and handed out LIFO so the
+    warmest connection is reused first. Checkouts block for at most `timeout`
+    seconds when every connection is in use. Only connections that sat idle
+    for more than `ping_idle` seconds are pinged on checkout; a connection
+    whose query fails is discarded instead of being returned.
+    """
+
+    def __init__(self, backend, size, timeout, ping_idle):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.ping_idle = ping_idle
+        self._idle = queue.LifoQueue()  # (connection, time it was returned)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._checkout_failures = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _acquire(self):
+        # Reuse an idle connection, open a new one if below capacity,
+        # otherwise wait for one to be returned. Returns (connection, idle seconds).
         try:
-            connection = mysql.connector.connect(
-                host=db_host, user=db_user, password=db_password, database=db_name
+            return self._from_idle(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self.backend.connect(), 0.0
+            except DB_ERRORS:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._from_idle(self._idle.get(timeout=self.timeout))
+        except queue.Empty:
+            raise PoolError(
+                f"No connection available within {self.timeout}s "
+                f"(pool size {self.size})."
             )
-            cursor = connection.cursor()
-            cursor.execute("SELECT * FROM students")
-            _ = cursor.fetchall()  # Fetch results but don't use them
-            query_count += 1
-        except mysql.connector.Error as err:
-            print(f"Query failed during background task: {err}", flush=True)
-            time.sleep(1)  # Wait a bit before retrying if there's an error
+
+    @staticmethod
+    def _from_idle(entry):
+        connection, returned_at = entry
+        return connection, time.monotonic() - returned_at
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened -= 1
+        try:
+            connection.close()
+        except DB_ERRORS:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection and returns it to the pool afterwards."""
+        start = time.perf_counter()
+        try:
+            connection, idle = self._acquire()
+        except DB_ERRORS:
+            with self._lock:
+                self._checkout_failures += 1
+            raise
+        if idle > self.ping_idle:
+            # The server may have dropped a long-idle connection
+            try:
+                self.backend.ping(connection)
+            except DB_ERRORS:
+                self._discard(connection)
+                with self._lock:
+                    self._checkout_failures += 1
+                raise
+        wait = time.perf_counter() - start
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_time_total += wait
+            self._wait_time_max = max(self._wait_time_max, wait)
+
+        healthy = True
+        try:
+            yield connection
+        except DB_ERRORS:
+            healthy = False
+            raise
         finally:
-            if cursor:
-                cursor.close()
-            if connection and connection.is_connected():
-                connection.close()
+            with self._lock:
+                self._in_use -= 1
+            if healthy:
+                try:
+                    # End the read snapshot so the next user sees fresh data.
+                    connection.rollback()
+                except DB_ERRORS:
+                    self._discard(connection)
+                else:
+                    self._idle.put((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "backend": self.backend.name,
+                "size": self.size,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": checkouts,
+                "checkout_failures": self._checkout_failures,
+                "wait_time_avg_sec": (
+                    self._wait_time_total / checkouts if checkouts else 0.0
+                ),
+                "wait_time_max_sec": self._wait_time_max,
+            }
+
+
+# --- Student Lookup Cache ---
+
+
+class StudentCache:
+    """
+    In-process read-through cache for student lookups.
+
+    Entries expire `ttl` seconds after they were stored, and the least
+    recently used entry is evicted once `max_entries` is reached. Missing
+    students are cached as None so repeated 404s skip the database too.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key):
+        """Returns the cached value, or StudentCache._MISSING if absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+            self._misses += 1
+            return self._MISSING
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": True,
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+student_cache = (
+    StudentCache(STUDENT_CACHE_SIZE, STUDENT_CACHE_TTL)
+    if STUDENT_CACHE_SIZE > 0
+    else None
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    The pool is created lazily so that each gunicorn worker gets its own.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(db_backend, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_IDLE_SEC)
+    return _pool
+
+
+def setup_database_and_table():
+    """
+    Creates the database if it doesn't exist, and then creates
+    a 'students' table if it doesn't exist.
+    """
+    try:
+        db_backend.create_database()
+        print(f"Database '{DB_NAME}' is ready ({db_backend.name}).")
+    except DB_ERRORS as err:
+        print(f"An error occurred during setup: {err}")
+        return
+
+    try:
+        with get_pool().connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(db_backend.create_table_query)
+            connection.commit()
+            print("Table 'students' is ready.")
+            cursor.close()
+    except DB_ERRORS as err:
+        print(f"An error occurred during setup: {err}")
+
+
+def apply_secondary_indexes(cursor, mode):
+    """
+    Creates ("1") or drops ("drop") the index on students.name so lookups by
+    name can be compared. Any other mode leaves an existing index alone.
+    """
+    if mode not in ("1", "drop"):
+        return
+    cursor.execute(db_backend.index_exists_query)
+    (exists,) = cursor.fetchone()
+
+    if mode == "1" and not exists:
+        start = time.perf_counter()
+        cursor.execute("CREATE INDEX idx_students_name ON students (name)")
+        print(f"Created index 'idx_students_name' in {time.perf_counter() - start:.2f}s.")
+    elif mode == "drop" and exists:
+        cursor.execute(db_backend.drop_index_query)
+        print("Dropped index 'idx_students_name'.")
+
+
+def insert_sample_data(
+    target_rows=SEED_ROWS,
+    batch_size=SEED_BATCH_SIZE,
+    commit_every=SEED_COMMIT_EVERY,
+    secondary_indexes=DB_SECONDARY_INDEXES,
+):
+    """
+    Tops the students table up to `target_rows` rows of sample data.
+
+    Rows are inserted `batch_size` at a time and committed every
+    `commit_every` rows. Rerunning only inserts the missing rows, numbering
+    them after the current highest ID. The secondary index is applied after
+    loading, which is much faster than maintaining it row by row.
+    """
+
+    try:
+        with get_pool().connection() as connection:
+            cursor = connection.cursor()
+
+            # --- Check how much data the table already has ---
+            cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM students")
+            number_of_rows, max_id = cursor.fetchone()
+            missing_rows = target_rows - number_of_rows
+
+            if missing_rows <= 0:
+                print(
+                    f"Table 'students' already contains {number_of_rows} rows "
+                    f"(target {target_rows}). Skipping sample data insertion."
+                )
+            else:
+                print(
+                    f"Table has {number_of_rows} rows. Inserting {missing_rows} rows "
+                    f"of sample data..."
+                )
+                # INSERT IGNORE skips emails that already exist. On MySQL,
+                # executemany rewrites each batch into one multi-row INSERT.
+                insert_query = db_backend.sql(
+                    f"{db_backend.insert_ignore} INTO students (name, email) VALUES (%s, %s)"
+                )
+
+                start_time = time.perf_counter()
+                next_index = max_id + 1
+                inserted = 0
+                uncommitted = 0
+                while inserted < missing_rows:
+                    size = min(batch_size, missing_rows - inserted)
+                    students_to_add = [
+                        (f"student{i}", f"student{i}@gmail.com")
+                        for i in range(next_index, next_index + size)
+                    ]
+                    next_index += size
+
+                    cursor.executemany(insert_query, students_to_add)
+                    inserted += cursor.rowcount
+                    uncommitted += cursor.rowcount
+
+                    if uncommitted >= commit_every or inserted >= missing_rows:
+                        connection.commit()
+                        uncommitted = 0
+                        elapsed = time.perf_counter() - start_time
+                        print(
+                            f"  {inserted}/{missing_rows} rows "
+                            f"({inserted / elapsed:.0f} rows/sec)",
+                            flush=True,
+                        )
+
+                elapsed = time.perf_counter() - start_time
+                print(
+                    f"Successfully inserted {inserted} rows of sample data in "
+                    f"{elapsed:.2f}s ({inserted / elapsed:.0f} rows/sec)."
+                )
+
+            apply_secondary_indexes(cursor, secondary_indexes)
+            connection.commit()
+            cursor.close()
+
+    except DB_ERRORS as err:
+        print(f"An error occurred while inserting data: {err}")
+
+
+# --- Load Engine ---
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram. Buckets grow by 2% so percentiles are
+    accurate to within about 2% while memory stays constant per job.
+    """
+
+    _GROWTH = 1.02
+    _LOG_GROWTH = math.log(_GROWTH)
+
+    def __init__(self):
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        index = int(math.log(micros) / self._LOG_GROWTH)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        target = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= target:
+                upper = self._GROWTH ** (index + 1) / 1e6
+                return min(upper, self.max)
+        return self.max
+
+    def summary_ms(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min * 1000,
+            "mean": self.total / self.count * 1000,
+            "p50": self.percentile(50) * 1000,
+            "p95": self.percentile(95) * 1000,
+            "p99": self.percentile(99) * 1000,
+            "max": self.max * 1000,
+        }
+
+
+class LoadJob:
+    """
+    Drives the students table with `concurrency` worker threads for `duration` seconds.
+
+    Every query is a full scan of the table, read with `scan_mode`
+    ("stream" or "buffered", see query_all_students).
+
+    In "closed" mode each worker issues its next query as soon as the previous
+    one finishes, optionally paced so all workers together stay at `qps`.
+    In "open" mode a dispatcher schedules queries at exactly `qps` regardless
+    of how fast they complete, and latency is measured from the scheduled
+    start so queueing delay is not hidden.
+
+    Time spent waiting for a pooled connection (other jobs share the pool)
+    is recorded separately in `pool_wait`.
+    """
+
+    def __init__(self, duration, concurrency, qps, mode, scan_mode):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.duration = duration
+        self.concurrency = concurrency
+        self.qps = qps
+        self.mode = mode
+        self.scan_mode = scan_mode
+        self.state = "running"
+        self.latency = LatencyHistogram()
+        self.pool_wait = LatencyHistogram()
+        self.requests = 0
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+        self.last_error = None
+        self.missed = 0
+        self._lock = threading.Lock()
+        # At most one pending ticket per worker; slots no worker is free to
+        # take are counted as missed instead of piling up.
+        self._tickets = queue.Queue(maxsize=concurrency)
+        self._next_slot = 0.0
+        self._workers_alive = concurrency
+        self.start_time = None
+        self.end_time = None
+        self.finished_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.end_time = self.start_time + self.duration
+        self._next_slot = self.start_time
+        if self.mode == "open":
+            threading.Thread(target=self._dispatch, daemon=True).start()
+        for _ in range(self.concurrency):
+            threading.Thread(target=background_query_task, args=(self,), daemon=True).start()
+
+    def _dispatch(self):
+        # Hands out one ticket per scheduled start time until the deadline.
+        interval = 1.0 / self.qps
+        scheduled = self.start_time
+        while scheduled < self.end_time:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self._tickets.put_nowait(scheduled)
+            except queue.Full:
+                with self._lock:
+                    self.missed += 1
+            scheduled += interval
+
+    def next_request(self):
+        """
+        Blocks until the calling worker may issue its next query.
+        Returns the intended start time, or None once the job is over.
+        """
+        if self.mode == "open":
+            while True:
+                remaining = self.end_time - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                try:
+                    return self._tickets.get(timeout=min(remaining, 0.1))
+                except queue.Empty:
+                    continue
+
+        now = time.perf_counter()
+        if self.qps:
+            with self._lock:
+                slot = max(self._next_slot, now)
+                self._next_slot = slot + 1.0 / self.qps
+            if slot >= self.end_time:
+                return None
+            if slot > now:
+                time.sleep(slot - now)
+            return slot
+        return now if now < self.end_time else None
+
+    def record_success(self, latency, pool_wait, rows, nbytes):
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self.bytes += nbytes
+            self.latency.record(latency)
+            self.pool_wait.record(pool_wait)
+
+    def record_error(self, err):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.last_error = str(err)
+
+    def worker_finished(self):
+        with self._lock:
+            self._workers_alive -= 1
+            last_worker = self._workers_alive == 0
+            if last_worker:
+                self.missed += self._tickets.qsize()
+                self.state = "finished"
+                self.finished_time = time.perf_counter()
+        if last_worker:
+            print(
+                f"--- Finished load job {self.job_id}. Executed {self.requests} queries "
+                f"({self.errors} errors). ---",
+                flush=True,
+            )
+
+    def status(self):
+        with self._lock:
+            end = self.finished_time or time.perf_counter()
+            elapsed = end - self.start_time
+            completed = self.requests - self.errors
+            return {
+                "job_id": self.job_id,
+                "state": self.state,
+                "mode": self.mode,
+                "scan_mode": self.scan_mode,
+                "concurrency": self.concurrency,
+                "target_qps": self.qps,
+                "duration_sec": self.duration,
+                "elapsed_sec": elapsed,
+                "requests": self.requests,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "missed_requests": self.missed if self.mode == "open" else None,
+                "achieved_qps": completed / elapsed if elapsed > 0 else 0.0,
+                "rows_read": self.rows,
+                "bytes_read": self.bytes,
+                "rows_per_sec": self.rows / elapsed if elapsed > 0 else 0.0,
+                "bytes_per_sec": self.bytes / elapsed if elapsed > 0 else 0.0,
+                "latency_ms": self.latency.summary_ms(),
+                "pool_wait_ms": self.pool_wait.summary_ms(),
+            }
+
+
+load_jobs = {}
+_load_jobs_lock = threading.Lock()
+_LOAD_JOB_HISTORY = 100
+
+
+def iter_row_chunks(cursor, chunk_size):
+    """Yields the rows of an executed cursor in lists of at most `chunk_size` rows."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def query_all_students(scan_mode=SCAN_MODE, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Runs one full-table scan through the pool and returns (rows, bytes, pool_wait):
+    the rows and bytes read and the seconds spent waiting for a connection.
+
+    "stream" consumes rows `chunk_size` at a time from a server-side
+    (unbuffered) cursor, so memory stays flat whatever the table size.
+    "buffered" loads the whole result set with fetchall().
+    """
+    rows = nbytes = 0
+    start = time.perf_counter()
+    with get_pool().connection() as connection:
+        pool_wait = time.perf_counter() - start
+        cursor = db_backend.scan_cursor(connection, scan_mode)
+        cursor.execute("SELECT * FROM students")
+        if scan_mode == "stream":
+            chunks = iter_row_chunks(cursor, chunk_size)
+        else:
+            chunks = [cursor.fetchall()]
+
+        for chunk in chunks:
+            rows += len(chunk)
+            nbytes += sum(db_backend.row_bytes(row) for row in chunk)
+        cursor.close()
+    return rows, nbytes, pool_wait
+
+
+def background_query_task(job):
+    """Worker loop of a load job: queries the students table until the job ends."""
+    try:
+        while True:
+            scheduled = job.next_request()
+            if scheduled is None:
+                break
+            try:
+                rows, nbytes, pool_wait = query_all_students(job.scan_mode)
+                job.record_success(time.perf_counter() - scheduled, pool_wait, rows, nbytes)
+            except DB_ERRORS as err:
+                print(f"Query failed during background task: {err}", flush=True)
+                job.record_error(err)
+                if job.mode == "closed" and not job.qps:
+                    time.sleep(1)  # Wait a bit before retrying if there's an error
+    finally:
+        job.worker_finished()
+
+
+def start_load_job(duration, concurrency, qps, mode, scan_mode):
+    """Registers and starts a load job, or returns None if too many are running."""
+    with _load_jobs_lock:
+        running = sum(1 for job in load_jobs.values() if job.state == "running")
+        if running >= MAX_LOAD_JOBS:
+            return None
+
+        finished = [job_id for job_id, job in load_jobs.items() if job.state != "running"]
+        for job_id in finished[: max(0, len(load_jobs) - _LOAD_JOB_HISTORY + 1)]:
+            del load_jobs[job_id]
+
+        job = LoadJob(duration, concurrency, qps, mode, scan_mode)
+        load_jobs[job.job_id] = job
+        job.start()
 
     print(
-        f"--- Finished background task. Executed {query_count} queries. ---", flush=True
+        f"\n--- Starting load job {job.job_id}: {mode} loop, {concurrency} workers, "
+        f"target {qps or 'unbounded'} qps for {duration} seconds ---",
+        flush=True,
     )
+    return job
 
 
 @app.route("/list-students", methods=["GET"])
+@requires_db
 def list_students():
+    """
+    Starts a load job against the students table and returns its job ID.
+
+    Query parameters: duration (seconds), concurrency (worker threads),
+    qps (target queries per second, 0 = unbounded), mode ("closed"/"open")
+    and scan ("stream"/"buffered", defaults to SCAN_MODE). A job cannot be
+    cancelled, so duration is capped at MAX_LOAD_DURATION, and concurrency
+    at DB_POOL_SIZE so workers don't just queue for connections.
+    """
     try:
         duration = float(request.args.get("duration", 5))
-    except:
-        duration = 5.0
+        concurrency = int(request.args.get("concurrency", 1))
+        qps = float(request.args.get("qps", 0))
+    except ValueError:
+        return jsonify({"error": "duration, concurrency and qps must be numbers."}), 400
+    max_concurrency = min(MAX_LOAD_CONCURRENCY, DB_POOL_SIZE)
+    mode = request.args.get("mode", "closed")
+    scan_mode = request.args.get("scan", SCAN_MODE)
 
-    thread = threading.Thread(target=background_query_task, args=(duration,))
-    thread.daemon = True
-    thread.start()
+    if mode not in ("closed", "open"):
+        return jsonify({"error": "mode must be 'closed' or 'open'."}), 400
+    if scan_mode not in ("stream", "buffered"):
+        return jsonify({"error": "scan must be 'stream' or 'buffered'."}), 400
+    if not 0 < duration <= MAX_LOAD_DURATION:
+        return (
+            jsonify({"error": f"duration must be between 0 and {MAX_LOAD_DURATION:g} seconds."}),
+            400,
+        )
+    if not 1 <= concurrency <= max_concurrency:
+        return (
+            jsonify({"error": f"concurrency must be between 1 and {max_concurrency} (DB_POOL_SIZE)."}),
+            400,
+        )
+    if not (math.isfinite(qps) and 0 <= qps <= MAX_LOAD_QPS):
+        return jsonify({"error": f"qps must be between 0 and {MAX_LOAD_QPS:g}."}), 400
+    if mode == "open" and qps == 0:
+        return jsonify({"error": "open mode requires a positive qps."}), 400
 
-    return jsonify({"status": "started", "duration_sec": duration}), 200
+    job = start_load_job(duration, concurrency, qps, mode, scan_mode)
+    if job is None:
+        return (
+            jsonify({"error": f"Too many running load jobs (max {MAX_LOAD_JOBS})."}),
+            429,
+        )
+
+    return (
+        jsonify(
+            {
+                "status": "started",
+                "job_id": job.job_id,
+                "duration_sec": duration,
+                "concurrency": concurrency,
+                "qps": qps,
+                "mode": mode,
+                "scan_mode": scan_mode,
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/list-students/<job_id>", methods=["GET"])
+def get_load_job(job_id):
+    """Returns progress, achieved QPS, errors and latency percentiles of a load job."""
+    job = load_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    return jsonify(job.status()), 200
 
 
 @app.route("/processing_time/<int:student_id>", methods=["GET"])
+@requires_db
 def check_student(student_id):
     """
     Checks for a student by ID, measures the query time, and returns the result.
-    """
-    db_host = os.getenv("DB_HOST")
-    db_user = os.getenv("DB_USER")
-    db_password = os.getenv("DB_PASSWORD")
-    db_name = "student_db"
 
+    The connection checkout from the pool and the query itself are timed
+    separately so pool pressure does not hide inside the query latency.
+    When STUDENT_CACHE_SIZE is set, lookups are served from the cache first.
+    """
     student = None
-    connection = None
-    cursor = None
 
     start_time = time.perf_counter()  # Start high-resolution timer
 
+    if student_cache is not None:
+        student = student_cache.get(student_id)
+        if student is not StudentCache._MISSING:
+            end_time = time.perf_counter()
+            response_data = {
+                "start_time_sec": start_time,
+                "end_time_sec": end_time,
+                "processing_time_sec": end_time - start_time,
+                "connect_time_sec": 0.0,
+                "query_time_sec": 0.0,
+                "cache_hit": True,
+            }
+            return jsonify(response_data), 200 if student else 404
+
     try:
-        connection = mysql.connector.connect(
-            host=db_host, user=db_user, password=db_password, database=db_name
-        )
-        cursor = connection.cursor()
-        # Use %s for parameter substitution in mysql-connector
-        cursor.execute("SELECT * FROM students WHERE id = %s", (student_id,))
-        student = cursor.fetchone()
-    except mysql.connector.Error as err:
+        with get_pool().connection() as connection:
+            connected_time = time.perf_counter()
+            cursor = connection.cursor()
+            cursor.execute(
+                db_backend.sql("SELECT * FROM students WHERE id = %s"), (student_id,)
+            )
+            student = cursor.fetchone()
+            cursor.close()
+            end_time = time.perf_counter()
+    except DB_ERRORS as err:
         print(f"Error checking student: {err}")
         return jsonify({"error": "Database query failed."}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
 
-    end_time = time.perf_counter()
+    if student_cache is not None:
+        student_cache.put(student_id, student)
+
     duration = end_time - start_time
 
     response_data = {
         "start_time_sec": start_time,
         "end_time_sec": end_time,
         "processing_time_sec": duration,
+        "connect_time_sec": connected_time - start_time,
+        "query_time_sec": end_time - connected_time,
+        "cache_hit": False,
     }
 
     if student:
@@ -214,6 +1071,159 @@ def check_student(student_id):
         return jsonify(response_data), 404
 
 
+def stream_students_batch(student_ids, chunk_size):
+    """
+    Resolves student IDs with chunked `IN (...)` queries over one pooled
+    connection, yielding one NDJSON line per ID followed by a summary line.
+    `student_ids` may be any iterable, so ranges are never materialised.
+    """
+    ids = iter(student_ids)
+    queries = found = missing = 0
+
+    start_time = time.perf_counter()
+    try:
+        with get_pool().connection() as connection:
+            connected_time = time.perf_counter()
+            cursor = connection.cursor()
+            while True:
+                chunk = list(itertools.islice(ids, chunk_size))
+                if not chunk:
+                    break
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    db_backend.sql(
+                        f"SELECT id, name, email FROM students WHERE id IN ({placeholders})"
+                    ),
+                    chunk,
+                )
+                rows = {row[0]: row for row in cursor.fetchall()}
+                queries += 1
+
+                lines = []
+                for student_id in chunk:
+                    row = rows.get(student_id)
+                    if row:
+                        found += 1
+                        record = {"id": row[0], "name": row[1], "email": row[2], "found": True}
+                    else:
+                        missing += 1
+                        record = {"id": student_id, "found": False}
+                    lines.append(json.dumps(record))
+                yield "\n".join(lines) + "\n"
+            cursor.close()
+    except DB_ERRORS as err:
+        print(f"Error during batch lookup: {err}")
+        yield json.dumps({"error": "Database query failed.", "ids_resolved": found + missing}) + "\n"
+        return
+
+    end_time = time.perf_counter()
+    summary = {
+        "found": found,
+        "missing": missing,
+        "queries": queries,
+        "chunk_size": chunk_size,
+        "connect_time_sec": connected_time - start_time,
+        "processing_time_sec": end_time - start_time,
+    }
+    yield json.dumps({"summary": summary}) + "\n"
+
+
+@app.route("/processing_time/name/<name>", methods=["GET"])
+@requires_db
+def check_student_by_name(name):
+    """
+    Looks a student up by name, which only uses an index when the table was
+    seeded with DB_SECONDARY_INDEXES=1.
+    """
+    start_time = time.perf_counter()
+
+    try:
+        with get_pool().connection() as connection:
+            connected_time = time.perf_counter()
+            cursor = connection.cursor()
+            cursor.execute(
+                db_backend.sql("SELECT * FROM students WHERE name = %s LIMIT 1"), (name,)
+            )
+            student = cursor.fetchone()
+            cursor.close()
+            end_time = time.perf_counter()
+    except DB_ERRORS as err:
+        print(f"Error checking student: {err}")
+        return jsonify({"error": "Database query failed."}), 500
+
+    response_data = {
+        "start_time_sec": start_time,
+        "end_time_sec": end_time,
+        "processing_time_sec": end_time - start_time,
+        "connect_time_sec": connected_time - start_time,
+        "query_time_sec": end_time - connected_time,
+    }
+    return jsonify(response_data), 200 if student else 404
+
+
+@app.route("/students/batch", methods=["GET", "POST"])
+@requires_db
+def batch_students():
+    """
+    Looks up many students in one request and streams the results as NDJSON.
+
+    Accepts either a JSON body {"ids": [...]} or an inclusive range given as
+    `start`/`end` (query string or JSON body). `chunk_size` overrides
+    BATCH_CHUNK_SIZE for this request.
+    """
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "The JSON body must be an object."}), 400
+    params = {**request.args.to_dict(), **body}
+
+    try:
+        chunk_size = int(params.get("chunk_size", BATCH_CHUNK_SIZE))
+        if "ids" in params:
+            if not isinstance(params["ids"], list):
+                raise ValueError
+            student_ids = [int(student_id) for student_id in params["ids"]]
+            count = len(student_ids)
+        elif "start" in params and "end" in params:
+            first, last = int(params["start"]), int(params["end"])
+            # Checked before building the range: len() of a huge range overflows
+            count = max(0, last - first + 1)
+            student_ids = range(first, last + 1) if count <= BATCH_MAX_IDS else None
+        else:
+            return jsonify({"error": "Provide 'ids' or 'start' and 'end'."}), 400
+    except (TypeError, ValueError):
+        return jsonify({"error": "IDs, range bounds and chunk_size must be integers."}), 400
+
+    if chunk_size < 1:
+        return jsonify({"error": "chunk_size must be positive."}), 400
+    if count > BATCH_MAX_IDS:
+        return jsonify({"error": f"At most {BATCH_MAX_IDS} IDs per batch."}), 400
+
+    return Response(
+        stream_with_context(stream_students_batch(student_ids, chunk_size)),
+        mimetype="application/x-ndjson",
+    )
+
+
+@app.route("/pool-stats", methods=["GET"])
+def get_pool_stats():
+    """Returns usage counters for the shared connection pool."""
+    try:
+        pool = get_pool()
+    except DB_ERRORS as err:
+        return jsonify({"error": str(err)}), 500
+    return jsonify(pool.stats()), 200
+
+
+@app.route("/cache-stats", methods=["GET"])
+def get_cache_stats():
+    """Returns hit/miss/eviction counters for the student lookup cache."""
+    if student_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(student_cache.stats()), 200
+
+
 @app.route("/uptime", methods=["GET"])
 def get_startup_time():
     """
@@ -221,7 +1231,7 @@ def get_startup_time():
     """
     # 1. Simulate processing delay
     start_perf = time.perf_counter()
-    time.sleep(1)
+    time.sleep(UPTIME_DELAY_SEC)
 
     # 2. Capture the time right now (after the sleep)
     processing_done_time = time.time()
@@ -241,9 +1251,70 @@ def get_startup_time():
     )
 
 
-if __name__ == "__main__":
+@app.route("/startup", methods=["GET"])
+def get_startup_phases():
+    """
+    Returns how long each startup phase took, in seconds, and how long after
+    the process started the first request (and first 2xx) was served.
+    """
+    return (
+        jsonify(
+            {
+                "process_start_timestamp": PROCESS_START_TIME,
+                "app_start_timestamp": APP_START_TIME,
+                # [name, seconds] pairs, in the order the phases ran
+                "phases_sec": [[name, sec] for name, sec in startup_phases.items()],
+                "db_warmup": DB_WARMUP,
+                "db_ready": DB_READY.is_set(),
+                "time_to_first_request_sec": _first_request.get("any"),
+                "time_to_first_success_sec": _first_request.get("success"),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/ready", methods=["GET"])
+def get_readiness():
+    """Readiness probe: 200 once the database warmup has finished."""
+    if DB_READY.is_set():
+        return jsonify({"status": "ready"}), 200
+    return jsonify({"status": "warming_up"}), 503
+
+
+def initialize_database():
+    """Runs database setup and seeding, timing each as a startup phase."""
     print("--- Running Database Setup ---")
-    setup_database_and_table()
+    with startup_phase("db_setup"):
+        setup_database_and_table()
     print("\n--- Seeding Database with Sample Data ---")
-    insert_sample_data()
+    with startup_phase("seeding"):
+        insert_sample_data()
+
+
+def start_background_warmup():
+    """
+    Runs initialize_database() in a background thread so the server can bind
+    its port immediately. DB routes wait on DB_READY until it finishes.
+    """
+
+    def warmup():
+        try:
+            with startup_phase("db_warmup"):
+                initialize_database()
+        finally:
+            DB_READY.set()
+
+    DB_READY.clear()
+    threading.Thread(target=warmup, daemon=True).start()
+
+
+if DB_WARMUP == "background":
+    # Also covers gunicorn, which imports the module instead of running it.
+    start_background_warmup()
+
+
+if __name__ == "__main__":
+    if DB_WARMUP != "background":
+        initialize_database()
     app.run(host="0.0.0.0", port=5000)
@@ -1,7 +1,12 @@
-from flask import Flask, jsonify, request
-from llama_cpp import Llama
+from flask import Flask, Response, jsonify, request, stream_with_context
+from llama_cpp import Llama, LlamaRAMCache
 import time
 import os
+import json
+import queue
+import threading
+import ctypes
+import mmap
 from stable_diffusion_cpp import StableDiffusion
 
 # --- ANSI Color Codes ---
@@ -23,74 +28,538 @@ app = Flask(__name__)
 LLAMA_MODEL_PATH = "gemma-2-2b-it-Q8_0.gguf"
 STABLE_DIFFUSION_MODEL_PATH = "stable-diffusion-v1-5-pruned-emaonly-Q8_0.gguf"
 IMAGE_OUTPUT_FOLDER = "generated_images"
+MAX_TOKENS = 200
+LLM_QUEUE_DEPTH = int(os.environ.get("LLM_QUEUE_DEPTH", 8))              # Waiting /text2text requests, more get 429
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", 300))  # Default deadline in seconds, incl. queueing
+LLM_PREFIX_CACHE_BYTES = int(os.environ.get("LLM_PREFIX_CACHE_BYTES", 0))  # Memory for saved prompt states, 0 = off
+MODEL_INIT_MODE = os.environ.get("MODEL_INIT_MODE", "background")       # "eager", "background" or "lazy"
+MODEL_LOAD_TIMEOUT = float(os.environ.get("MODEL_LOAD_TIMEOUT", 600))    # Seconds a request waits for its model
+LLAMA_USE_MMAP = os.environ.get("LLAMA_USE_MMAP", "1") == "1"            # Map the GGUF instead of reading it into RAM
+LLAMA_USE_MLOCK = os.environ.get("LLAMA_USE_MLOCK", "0") == "1"          # Pin the weights so they are never paged out
+MODEL_PREWARM = os.environ.get("MODEL_PREWARM", "0") == "1"              # Read model files into the page cache first
+MODEL_PREWARM_CHUNK_MB = int(os.environ.get("MODEL_PREWARM_CHUNK_MB", 16))
 
 text2text_model = None
 text2image_pipe = None
 loading_times = {"text2text": 0.0, "text2image": 0.0}
+text2image_lock = threading.Lock()
 
 if not os.path.exists(IMAGE_OUTPUT_FOLDER):
     os.makedirs(IMAGE_OUTPUT_FOLDER)
 
-def initialize_models():
-    global text2text_model, text2image_pipe, loading_times
+class ModelSlot:
+    """
+    One model, its loader and its state: NOT_LOADED, LOADING, READY or FAILED.
+    Each model loads independently, so one model can serve while the other
+    is still loading or has failed.
+    """
+
+    def __init__(self, name, label, path, loader):
+        self.name = name
+        self.label = label
+        self.path = path
+        self.loader = loader
+        self.load_stats = {}
+        self.status = "NOT_LOADED"
+        self.error = None
+        self.load_started_at = None
+        self.settled = threading.Event()  # Set once READY or FAILED
+        self.lock = threading.Lock()
+
+    def claim(self):
+        """Moves NOT_LOADED to LOADING; True for the one caller that should load."""
+        with self.lock:
+            if self.status != "NOT_LOADED":
+                return False
+            self.status = "LOADING"
+            return True
+
+    def load(self):
+        if not self.claim():
+            return
+        self.load_started_at = time.time()
+        # Whether the weights will come from the page cache or from disk
+        self.load_stats = {"rss_before_mb": read_rss_mb(), "page_cache_before": page_cache_residency(self.path)}
+        start = time.perf_counter()
+        try:
+            if MODEL_PREWARM:
+                prewarm_bytes = prewarm_file(self.path)
+                io_seconds = time.perf_counter() - start
+                self.load_stats.update(
+                    io_seconds=round(io_seconds, 3),
+                    prewarm_bytes=prewarm_bytes,
+                    prewarm_mb_per_second=round(prewarm_bytes / 2**20 / io_seconds, 1) if io_seconds > 0 else None,
+                )
+
+            init_start = time.perf_counter()
+            self.loader()
+            self.load_stats["init_seconds"] = round(time.perf_counter() - init_start, 3)
+            loading_times[self.name] = round(time.perf_counter() - start, 2)
+            self.status = "READY"
+            colored_print(f"{self.label} loaded: {loading_times[self.name]}s", TextColor.GREEN)
+        except Exception as e:
+            self.error = str(e)
+            self.status = "FAILED"
+            colored_print(f"{self.label} Error: {e}", TextColor.RED)
+        finally:
+            self.load_stats.update(
+                rss_after_mb=read_rss_mb(),
+                page_cache_after=page_cache_residency(self.path),
+            )
+            self.settled.set()
+
+    def start(self):
+        """Loads the model in a background thread unless it is already loading or loaded."""
+        if self.status == "NOT_LOADED":
+            threading.Thread(target=self.load, daemon=True).start()
+
+    def info(self):
+        return {
+            "status": self.status,
+            "loading_time_seconds": loading_times[self.name],
+            "load_started_at": self.load_started_at,
+            "load_stats": self.load_stats,
+            "error": self.error,
+        }
 
-    # Initialize LLM
-    start = time.perf_counter()
+def read_rss_mb():
+    """Resident set size of this process in MiB, from /proc/self/status."""
     try:
-        text2text_model = Llama(model_path=LLAMA_MODEL_PATH, n_ctx=2048, verbose=False)
-        loading_times["text2text"] = round(time.perf_counter() - start, 2)
-        colored_print(f"Llama loaded: {loading_times['text2text']}s", TextColor.GREEN)
-    except Exception as e:
-        colored_print(f"LLM Error: {e}", TextColor.RED)
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
 
-    # Initialize SD
-    start = time.perf_counter()
+def page_cache_residency(path):
+    """
+    Fraction of a file's pages that are in the page cache, asked with
+    mincore(2) on a mapping that is never touched, so nothing is read in.
+    None where that isn't available.
+    """
     try:
-        text2image_pipe = StableDiffusion(model_path=STABLE_DIFFUSION_MODEL_PATH, wtype="default")
-        loading_times["text2image"] = round(time.perf_counter() - start, 2)
-        colored_print(f"SD loaded: {loading_times['text2image']}s", TextColor.GREEN)
-    except Exception as e:
-        colored_print(f"SD Error: {e}", TextColor.RED)
+        size = os.path.getsize(path)
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+        libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    except (OSError, AttributeError):
+        return None
+    if size == 0:
+        return None
+
+    pages = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+    residency = (ctypes.c_ubyte * pages)()
+    with open(path, "rb") as f:
+        address = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, f.fileno(), 0)
+    if address in (None, ctypes.c_void_p(-1).value):
+        return None
+    try:
+        if libc.mincore(address, size, residency) != 0:
+            return None
+    finally:
+        libc.munmap(address, size)
+    # The low bit of each entry is set when that page is resident
+    resident = sum(entry & 1 for entry in residency)
+    return round(resident / pages, 3)
+
+def prewarm_file(path):
+    """Reads a file once, in MODEL_PREWARM_CHUNK_MB chunks, so its pages are in the page cache. Returns the bytes read."""
+    buffer = bytearray(MODEL_PREWARM_CHUNK_MB * 2**20)
+    total = 0
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                return total
+            total += read
+
+def load_text2text():
+    global text2text_model
+    model = Llama(
+        model_path=LLAMA_MODEL_PATH,
+        n_ctx=2048,
+        use_mmap=LLAMA_USE_MMAP,
+        use_mlock=LLAMA_USE_MLOCK,
+        verbose=False
+    )
+    if LLM_PREFIX_CACHE_BYTES > 0:
+        # Saves the evaluated state after each request; later prompts sharing
+        # a prefix restore it instead of evaluating it again (LRU by size)
+        model.set_cache(LlamaRAMCache(capacity_bytes=LLM_PREFIX_CACHE_BYTES))
+    text2text_model = model
+
+def load_text2image():
+    global text2image_pipe
+    # stable-diffusion.cpp has no mmap/mlock option; it always reads the
+    # weights into its own buffers, so only the prewarm applies here
+    text2image_pipe = StableDiffusion(model_path=STABLE_DIFFUSION_MODEL_PATH, wtype="default")
+
+model_slots = {
+    "text2text": ModelSlot("text2text", "Llama", LLAMA_MODEL_PATH, load_text2text),
+    "text2image": ModelSlot("text2image", "SD", STABLE_DIFFUSION_MODEL_PATH, load_text2image),
+}
+
+def initialize_models():
+    """
+    eager: load both models one after the other before serving.
+    background: load both concurrently while the server already answers.
+    lazy: load each model on its first request.
+    """
+    if MODEL_INIT_MODE == "eager":
+        for slot in model_slots.values():
+            slot.load()
+    elif MODEL_INIT_MODE == "lazy":
+        colored_print("Models load on their first request (MODEL_INIT_MODE=lazy)", TextColor.YELLOW)
+    else:
+        if MODEL_INIT_MODE != "background":
+            colored_print(f"Unknown MODEL_INIT_MODE '{MODEL_INIT_MODE}', using background", TextColor.RED)
+        for slot in model_slots.values():
+            slot.start()
+
+def wait_for_model(name):
+    """
+    Waits until the model is READY, starting its load first if it hasn't
+    (lazy mode). Returns an error response, or None once it can be used.
+    """
+    slot = model_slots[name]
+    slot.start()
+    if not slot.settled.wait(MODEL_LOAD_TIMEOUT):
+        return jsonify({"error": f"Timed out waiting for the {name} model ({slot.status})"}), 503
+    if slot.status == "FAILED":
+        return jsonify({"error": f"The {name} model failed to load: {slot.error}"}), 503
+    return None
 
 @app.route("/loading-stats", methods=["GET"])
 def get_loading_stats():
-    """Returns the time taken to initialize models on startup."""
+    """Returns the state and load time of each model."""
+    statuses = {slot.status for slot in model_slots.values()}
+    if statuses == {"READY"}:
+        status = "ready"
+    elif "LOADING" in statuses:
+        status = "loading"
+    elif "FAILED" in statuses:
+        status = "partial_failure" if "READY" in statuses else "failed"
+    else:
+        status = "not_loaded"
     return jsonify({
-        "status": "ready" if text2text_model and text2image_pipe else "partial_failure",
+        "status": status,
+        "init_mode": MODEL_INIT_MODE,
         "loading_times_seconds": loading_times,
+        "models": {name: slot.info() for name, slot in model_slots.items()},
     })
 
+@app.route("/ready/<name>", methods=["GET"])
+def model_ready(name):
+    """Per-model readiness probe: 200 once that model is READY, 503 otherwise. Doesn't trigger a lazy load."""
+    if name not in model_slots:
+        return jsonify({"error": f"Unknown model '{name}'"}), 404
+    slot = model_slots[name]
+    return jsonify(dict(slot.info(), model=name)), 200 if slot.status == "READY" else 503
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list, or None if it is empty."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def streaming_performance(start_time, token_times, end_time, prompt_tokens, reused_tokens=0):
+    """
+    Latency breakdown of a streamed reply. Until the first token arrives the
+    model is evaluating the prompt, so time-to-first-token gives the
+    prompt-eval rate and the time after it the generation rate.
+    Reused prompt tokens were not evaluated and don't count toward the rate.
+    """
+    evaluated_tokens = prompt_tokens - reused_tokens
+    duration = end_time - start_time
+    ttft = token_times[0] - start_time if token_times else None
+    gaps_ms = sorted(round((b - a) * 1000, 2) for a, b in zip(token_times, token_times[1:]))
+    generation_time = token_times[-1] - token_times[0] if len(token_times) > 1 else 0
+
+    return {
+        "processing_time_second": round(duration, 3),
+        "time_to_first_token_second": round(ttft, 3) if ttft is not None else None,
+        "inter_token_latency_ms": {
+            "mean": round(sum(gaps_ms) / len(gaps_ms), 2) if gaps_ms else None,
+            "p50": percentile(gaps_ms, 50),
+            "p90": percentile(gaps_ms, 90),
+            "p99": percentile(gaps_ms, 99),
+            "max": gaps_ms[-1] if gaps_ms else None,
+        },
+        "prompt_eval_tokens_per_second": round(evaluated_tokens / ttft, 2) if ttft else None,
+        "generation_tokens_per_second": round(len(gaps_ms) / generation_time, 2) if generation_time > 0 else None,
+        "tokens_per_second": round(len(token_times) / duration, 2) if duration > 0 else 0,
+        "input_tokens": prompt_tokens,
+        "reused_prompt_tokens": reused_tokens,
+        "output_tokens": len(token_times),
+        "total_tokens": prompt_tokens + len(token_times)
+    }
+
+# --- Text-to-Text Scheduling ---
+class GenerationRequest:
+    """A prompt waiting for the inference worker, plus the events the worker sends back."""
+
+    def __init__(self, prompt, max_tokens, timeout):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.enqueued_at = time.perf_counter()
+        self.deadline = self.enqueued_at + timeout
+        self.started_at = None
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+        self.cancelled = threading.Event()
+        # ("token", text, time) per token, then ("done", finish_reason, time) or ("error", message, time)
+        self.events = queue.Queue()
+
+    def iter_events(self):
+        """
+        Yields the worker's events. Waits no longer than the deadline, even
+        while still queued: then cancels the request and yields a "deadline" done.
+        """
+        while True:
+            try:
+                event = self.events.get(timeout=max(0, self.deadline - time.perf_counter()))
+            except queue.Empty:
+                self.cancelled.set()
+                yield ("done", "deadline", time.perf_counter())
+                return
+            yield event
+            if event[0] != "token":
+                return
+
+def reusable_prompt_tokens(prompt_tokens):
+    """
+    How many prompt tokens llama_cpp will skip evaluating: the longest prefix
+    shared with the state the previous request left in the context, or with
+    a state saved in the prefix cache. The last prompt token is always
+    evaluated again to get fresh logits.
+    """
+    reused = Llama.longest_token_prefix(list(text2text_model._input_ids), prompt_tokens)
+    if text2text_model.cache is not None:
+        for cached_tokens in text2text_model.cache.cache_state:
+            reused = max(reused, Llama.longest_token_prefix(cached_tokens, prompt_tokens))
+    return max(0, min(reused, len(prompt_tokens) - 1))
+
+class InferenceScheduler:
+    """
+    The only caller of text2text_model. Requests wait in a bounded FIFO queue
+    and one worker thread runs them one at a time. Generation is streamed
+    internally, so a request is stopped between tokens once its deadline
+    passes or its client has gone away.
+    """
+
+    def __init__(self, max_queue_depth):
+        self.max_queue_depth = max_queue_depth
+        self.requests = queue.Queue(maxsize=max_queue_depth)
+        self.stats_lock = threading.Lock()
+        self.stats = {"served": 0, "rejected": 0, "cancelled": 0, "deadline_exceeded": 0, "failed": 0,
+                      "prompt_tokens": 0, "reused_prompt_tokens": 0,
+                      "prefix_cache_bytes": 0, "prefix_cache_entries": 0}
+        self.busy = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def count(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    def submit(self, prompt, max_tokens, timeout):
+        """Queues a prompt; returns its GenerationRequest, or None if the queue is full."""
+        job = GenerationRequest(prompt, max_tokens, timeout)
+        try:
+            self.requests.put_nowait(job)
+        except queue.Full:
+            self.count("rejected")
+            return None
+        return job
+
+    def _run(self):
+        while True:
+            job = self.requests.get()
+            self.busy = True
+            try:
+                self._generate(job)
+            except Exception as e:
+                self.count("failed")
+                job.events.put(("error", str(e), time.perf_counter()))
+            finally:
+                self._record_cache_size()
+                self.busy = False
+
+    def _record_cache_size(self):
+        # Read here because only this thread touches the cache; iterating it
+        # from a request thread races with inserts and evictions
+        cache = text2text_model.cache if text2text_model else None
+        if cache is not None:
+            with self.stats_lock:
+                self.stats.update(prefix_cache_bytes=cache.cache_size, prefix_cache_entries=len(cache.cache_state))
+
+    def _generate(self, job):
+        job.started_at = time.perf_counter()
+        if job.started_at > job.deadline:
+            self.count("deadline_exceeded")
+            job.events.put(("done", "deadline", job.started_at))
+            return
+        if job.cancelled.is_set():
+            self.count("cancelled")
+            job.events.put(("done", "cancelled", job.started_at))
+            return
+        if not text2text_model:
+            raise RuntimeError("Model not ready")
+
+        # Tokenized the way create_completion does it
+        prompt_tokens = text2text_model.tokenize(job.prompt.encode("utf-8"), special=True)
+        job.prompt_tokens = len(prompt_tokens)
+        job.reused_tokens = reusable_prompt_tokens(prompt_tokens)
+        self.count("prompt_tokens", job.prompt_tokens)
+        self.count("reused_prompt_tokens", job.reused_tokens)
+        finish_reason = "stop"
+        # llama_cpp yields one chunk per sampled token, then a final empty one
+        stream = text2text_model(job.prompt, max_tokens=job.max_tokens, stream=True)
+        try:
+            for chunk in stream:
+                now = time.perf_counter()
+                if job.cancelled.is_set():
+                    # The request thread also cancels once the deadline passes
+                    finish_reason = "deadline" if now > job.deadline else "cancelled"
+                    break
+                choice = chunk["choices"][0]
+                # "stop", or "length" when the reply was cut off at max_tokens
+                finish_reason = choice.get("finish_reason") or finish_reason
+                if choice.get("finish_reason") and not choice["text"]:
+                    # llama_cpp ends the stream with an empty chunk that only
+                    # carries finish_reason; it is not a token
+                    break
+                job.events.put(("token", choice["text"], now))
+                if now > job.deadline:
+                    finish_reason = "deadline"
+                    break
+        finally:
+            stream.close()
+
+        if finish_reason == "cancelled":
+            self.count("cancelled")
+        elif finish_reason == "deadline":
+            self.count("deadline_exceeded")
+        else:
+            self.count("served")
+        job.events.put(("done", finish_reason, time.perf_counter()))
+
+    def snapshot(self):
+        with self.stats_lock:
+            return dict(self.stats, queued=self.requests.qsize(), max_queue_depth=self.max_queue_depth, busy=self.busy)
+
+scheduler = InferenceScheduler(LLM_QUEUE_DEPTH)
+
+def job_performance(job, token_times, end_time):
+    # A request whose deadline passed in the queue was never started
+    started_at = job.started_at or end_time
+    performance = streaming_performance(started_at, token_times, end_time, job.prompt_tokens, job.reused_tokens)
+    performance["queue_wait_second"] = round(started_at - job.enqueued_at, 3)
+    return performance
+
+def stream_reply(job):
+    """Sends each generated token as a server-sent "token" event, then a "done" event with the metrics."""
+    def generate():
+        token_times = []
+        reply = []
+        try:
+            for kind, value, at in job.iter_events():
+                if kind == "error":
+                    yield sse_event("error", {"error": value})
+                    return
+                if kind == "done":
+                    finish_reason, end_time = value, at
+                    break
+                token_times.append(at)
+                reply.append(value)
+                yield sse_event("token", {
+                    "index": len(token_times) - 1,
+                    "text": value,
+                    "elapsed_ms": round((at - job.enqueued_at) * 1000, 1)
+                })
+        finally:
+            # Also runs when the client disconnects: stop generating for nobody
+            job.cancelled.set()
+
+        performance = job_performance(job, token_times, end_time)
+        colored_print(f"Streamed {len(token_times)} tokens, TTFT {performance['time_to_first_token_second']}s", TextColor.CYAN)
+        yield sse_event("done", {"reply": "".join(reply).strip(), "finish_reason": finish_reason, "performance": performance})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream")
+
 # --- Text-to-Text Endpoint ---
 @app.route("/text2text", methods=["GET"])
 def query():
     prompt = request.args.get("prompt", "")
-    if not text2text_model or not prompt:
-        return jsonify({"error": "Model not ready or prompt missing"}), 400
+    if not prompt:
+        return jsonify({"error": "prompt missing"}), 400
+    error_response = wait_for_model("text2text")
+    if error_response:
+        return error_response
+    try:
+        timeout = float(request.args.get("timeout", LLM_REQUEST_TIMEOUT))
+    except ValueError:
+        return jsonify({"error": "timeout must be a number of seconds"}), 400
 
-    start_time = time.perf_counter()
+    job = scheduler.submit(prompt, MAX_TOKENS, timeout)
+    if job is None:
+        return jsonify({"error": f"Too many queued requests (max {LLM_QUEUE_DEPTH}), retry later"}), 429, {"Retry-After": "1"}
+
+    # ?stream=1 sends tokens as server-sent events while they are generated
+    if request.args.get("stream", "0").lower() in ("1", "true"):
+        return stream_reply(job)
+
+    token_times = []
+    reply = []
     try:
-        # Inference
-        out = text2text_model(prompt, max_tokens=200, stream=False)
-        end_time = time.perf_counter()
+        for kind, value, at in job.iter_events():
+            if kind == "error":
+                return jsonify({"error": value}), 500
+            if kind == "done":
+                finish_reason, end_time = value, at
+                break
+            token_times.append(at)
+            reply.append(value)
+    finally:
+        job.cancelled.set()
 
-        # Calculate Metrics
-        duration = end_time - start_time
-        tokens_generated = out["usage"]["completion_tokens"]
-        # TPS = Tokens Per Second
-        tps = round(tokens_generated / duration, 2) if duration > 0 else 0
+    body = {
+        "reply": "".join(reply).strip(),
+        "finish_reason": finish_reason,
+        "performance": job_performance(job, token_times, end_time)
+    }
+    if finish_reason == "deadline":
+        body["error"] = f"Deadline of {timeout}s exceeded"
+        return jsonify(body), 504
+    return jsonify(body)
 
-        return jsonify({
-            "reply": out["choices"][0]["text"].strip(),
-            "performance": {
-                "processing_time_second": round(duration, 3),
-                "tokens_per_second": tps,
-                "input_tokens": out["usage"]["prompt_tokens"],
-                "output_tokens": out["usage"]["completion_tokens"],
-                "total_tokens": out["usage"]["total_tokens"]
-            }
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+@app.route("/queue-stats", methods=["GET"])
+def get_queue_stats():
+    """Returns the text2text queue depth and how many requests were served, rejected, cancelled or timed out."""
+    return jsonify(scheduler.snapshot())
+
+@app.route("/prefix-cache-stats", methods=["GET"])
+def get_prefix_cache_stats():
+    """Returns the size of the prompt prefix cache and the share of prompt tokens reused."""
+    stats = scheduler.snapshot()
+    return jsonify({
+        "enabled": text2text_model is not None and text2text_model.cache is not None,
+        "capacity_bytes": LLM_PREFIX_CACHE_BYTES,
+        # As of the end of the last request, recorded by the inference worker
+        "size_bytes": stats["prefix_cache_bytes"],
+        "entries": stats["prefix_cache_entries"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "reused_prompt_tokens": stats["reused_prompt_tokens"],
+        "reuse_ratio": round(stats["reused_prompt_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else None,
+    })
 
 # --- Text-to-Image Endpoint ---
 @app.route("/text2image", methods=["GET"])
@@ -98,8 +567,11 @@ def generate_image():
     global text2image_pipe
     prompt = request.args.get("prompt", "")
 
-    if not text2image_pipe or not prompt:
-        return jsonify({"error": "Model not ready or prompt missing"}), 400
+    if not prompt:
+        return jsonify({"error": "prompt missing"}), 400
+    error_response = wait_for_model("text2image")
+    if error_response:
+        return error_response
 
     start_time = time.perf_counter()
     try:
@@ -116,7 +588,9 @@ def generate_image():
 
         # Generate the image using unpacking (**)
         # If steps_arg was None, sample_steps is never sent to the library
-        output = text2image_pipe.generate_image(**kwargs)
+        # stable-diffusion.cpp isn't safe to call from several threads at once
+        with text2image_lock:
+            output = text2image_pipe.generate_image(**kwargs)
 
         duration = time.perf_counter() - start_time
 
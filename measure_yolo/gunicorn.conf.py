@@ -0,0 +1,22 @@
+import os
+
+# --- Gunicorn settings for measure_yolo ---
+# WEB_CONCURRENCY worker processes, each with GUNICORN_THREADS request threads.
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+bind = "0.0.0.0:8080"
+timeout = 3000
+graceful_timeout = 5
+accesslog = "-"
+errorlog = "-"
+
+# With several workers, load the model once in the master before forking so
+# all workers share one copy of the weights.
+preload_app = workers > 1
+if preload_app:
+    os.environ["MODEL_PRELOAD"] = "1"
+
+
+def post_fork(server, worker):
+    import main
+    main.configure_worker(workers)
@@ -2,11 +2,24 @@ import os
 import time
 import cv2
 import numpy as np
-from PIL import Image
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
+import torch
+import torchvision
 from torch import hub
 import sys
+import gc
+import ctypes
 import threading
+import queue
+import hashlib
+import json
+import statistics
+from collections import OrderedDict, deque, namedtuple
+
+try:
+    import xxhash
+except ImportError:  # Optional, result-cache keys fall back to BLAKE2
+    xxhash = None
 
 app = Flask(__name__)
 
@@ -21,152 +34,1426 @@ class Colors:
     ENDC = '\033[0m'     # Reset color
     BOLD = '\033[1m'     # Bold
 
+# --- Model Files ---
+YOLOV5_REPO_PATH = os.environ.get("YOLOV5_REPO_PATH", "/app/ultralytics/yolov5")  # Contains hubconf.py
+MODEL_WEIGHTS_PATH = os.environ.get("MODEL_WEIGHTS_PATH", "/app/yolov5n.pt")
+
+# --- Inference Backend Configuration ---
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")       # "torch", "torchscript", "onnx" or "int8"
+INFERENCE_BACKENDS = ("torch", "torchscript", "onnx", "int8")
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "/app/model_cache")  # Where exported models are cached
+MODEL_RELOAD_CACHE = os.environ.get("MODEL_RELOAD_CACHE", "1") == "1"    # Pickle the hub model for fast reloads
+INFERENCE_SIZE = int(os.environ.get("INFERENCE_SIZE", 640))              # Longest side of the model input
+CONF_THRESHOLD = float(os.environ.get("CONF_THRESHOLD", 0.25))           # Same defaults as yolov5's AutoShape
+IOU_THRESHOLD = float(os.environ.get("IOU_THRESHOLD", 0.45))
+MAX_DETECTIONS = 1000
+
+# --- Tiled Inference Configuration ---
+TILE_INFERENCE = os.environ.get("TILE_INFERENCE", "0") == "1"  # Default of the per-request ?tile= switch
+TILE_SIZE = int(os.environ.get("TILE_SIZE", 640))              # Tile edge in frame pixels
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", 0.2))      # Share of a tile overlapping its neighbour
+
 # --- Global Model State ---
 model = None
-MODEL_STATUS = "LOADING" # Options: "LOADING", "READY", "FAILED"
+MODEL_STATUS = "LOADING" # Options: "LOADING", "WARMING_UP", "READY", "FAILED", "UNLOADED"
 MODEL_ERROR = None       # To store the exception message if loading fails
 MODEL_LOAD_TIME = 0.0    # Stores how long (in seconds) the model took to load
+MODEL_WARMUP_TIME = 0.0  # Stores how long (in seconds) the warmup inferences took
+MODEL_SETTLED = threading.Event()  # Set once the status is READY, FAILED or UNLOADED
+MODEL_LOADS = deque(maxlen=50)     # One record per model load, newest last
+model_lifecycle_lock = threading.Lock()  # Serializes /model/load and /model/unload
+model_lock = threading.Lock()  # The model is not thread-safe; one call at a time
+
+# --- Multi-Worker Configuration ---
+# Set by gunicorn.conf.py: load the model once in the gunicorn master so the
+# forked workers share its weights instead of each loading a copy.
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "0") == "1"
+WORKER_COUNT = 1       # Gunicorn workers sharing the CPU quota, set by configure_worker()
+WORKER_THREADS = None  # Intra-op threads of this worker, set by the CPU tuner
+APPLIED_THREADS = {}   # Thread name -> intra-op threads last applied on that inference thread
+
+# --- CPU Autotuning Configuration ---
+CGROUP_ROOT = os.environ.get("CGROUP_ROOT", "/sys/fs/cgroup")
+CPU_TUNE_INTERVAL_SEC = float(os.environ.get("CPU_TUNE_INTERVAL_SEC", 10))  # 0 disables periodic re-checks
+
+# --- Warmup Configuration ---
+WARMUP_RUNS = int(os.environ.get("WARMUP_RUNS", 1))  # Dummy inferences per resolution, 0 disables warmup
+WARMUP_RESOLUTIONS = os.environ.get("WARMUP_RESOLUTIONS", "640x640,3840x2160")  # Comma-separated WIDTHxHEIGHT
+
+# --- Batching Configuration ---
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 1))         # 1 disables batching
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 10)) # Max time a frame waits for others
+
+# --- Result Cache Configuration ---
+RESULT_CACHE_ENTRIES = int(os.environ.get("RESULT_CACHE_ENTRIES", 0))  # 0 disables the cache
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# --- Timed Detection Configuration ---
+DETECT_LOOP_SLEEP_MS = float(os.environ.get("DETECT_LOOP_SLEEP_MS", 0))  # Pause between timed iterations
+
+# --- Video Ingestion Configuration ---
+STREAM_SOURCE = os.environ.get("STREAM_SOURCE")                          # Default video file or stream URL
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", 8))          # Decoded frames waiting for inference
+STREAM_DROP_POLICY = os.environ.get("STREAM_DROP_POLICY", "drop_oldest") # "drop_oldest", "drop_newest" or "block"
+STREAM_DROP_POLICIES = ("drop_oldest", "drop_newest", "block")
+STREAM_STALL_TIMEOUT = float(os.environ.get("STREAM_STALL_TIMEOUT", 30))  # Seconds without a decoded frame before giving up
+
+# --- Inference Backends ---
+
+EXPORT_EXTENSIONS = {"torchscript": "torchscript", "onnx": "onnx", "int8": "int8.onnx"}
+
+# Same fields as yolov5's Detections, so detect_frames() reads every backend alike
+ExportedResults = namedtuple("ExportedResults", ["xyxy", "t", "s", "names"])
+
+
+def load_torch_model():
+    """Loads yolov5n through torch.hub from the local repo clone, wrapped in AutoShape."""
+    loaded_model = hub.load(
+        YOLOV5_REPO_PATH,           # Path to the cloned repo (contains hubconf.py)
+        'custom',                   # Use 'custom' to load specific weights file
+        path=MODEL_WEIGHTS_PATH,    # Path to your local .pt file
+        source='local'              # Tells torch to look locally, not GitHub
+    )
+    loaded_model.conf = CONF_THRESHOLD
+    loaded_model.iou = IOU_THRESHOLD
+    return loaded_model
+
+
+def model_cache_base():
+    """Cache path (without extension) of artifacts derived from the current weights file."""
+    weights_name = os.path.splitext(os.path.basename(MODEL_WEIGHTS_PATH))[0]
+    try:
+        weights_mtime = int(os.path.getmtime(MODEL_WEIGHTS_PATH))
+    except OSError:
+        weights_mtime = 0
+    return os.path.join(MODEL_CACHE_DIR, f"{weights_name}-{weights_mtime}")
+
+
+def exported_model_base():
+    """Cache path (without extension) of exports of the current weights, traced with dynamic input shapes."""
+    return f"{model_cache_base()}-dynamic"
+
 
-def load_model_background():
+def load_torch_model_cached(use_cache=True):
+    """
+    Loads the torch model from the AutoShape module pickled by an earlier
+    load, which skips hubconf's imports, requirement checks and layer fusing.
+    Falls back to torch.hub and pickles the result for the next load.
+    Returns (model, source) where source is "cache" or "hub".
+    """
+    cache_path = f"{model_cache_base()}.autoshape.pt"
+    if use_cache and MODEL_RELOAD_CACHE and os.path.exists(cache_path):
+        if YOLOV5_REPO_PATH not in sys.path:
+            sys.path.insert(0, YOLOV5_REPO_PATH)  # The pickle refers to yolov5's model classes
+        loaded_model = torch.load(cache_path, map_location="cpu", weights_only=False)
+        loaded_model.conf = CONF_THRESHOLD
+        loaded_model.iou = IOU_THRESHOLD
+        return loaded_model, "cache"
+
+    loaded_model = load_torch_model()
+    if MODEL_RELOAD_CACHE:
+        try:
+            os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+            torch.save(loaded_model, f"{cache_path}.tmp")
+            os.replace(f"{cache_path}.tmp", cache_path)
+        except Exception as e:
+            print(f"{Colors.WARNING}Could not cache the model for fast reloads: {e}{Colors.ENDC}")
+    return loaded_model, "hub"
+
+
+def export_model(backend, base_path):
+    """
+    One-off export of the yolov5 weights for an exported backend. Traces the
+    network with dynamic batch and image size, and writes the artifact plus
+    the class names and stride to MODEL_CACHE_DIR. "int8" is the ONNX export with dynamically quantized
+    weights (ONNX Runtime quantizes Conv layers, torch's dynamic quantization doesn't).
+    """
+    print(f"{Colors.BLUE}Exporting model for the '{backend}' backend to {MODEL_CACHE_DIR}...{Colors.ENDC}")
+    export_start_time = time.monotonic()
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+
+    torch_model = load_torch_model()
+    network = torch_model.model.model  # AutoShape -> DetectMultiBackend -> DetectionModel
+    network.eval()
+    for module in network.modules():
+        if type(module).__name__ == "Detect":
+            module.inplace = False
+            module.export = True  # Only return the concatenated predictions
+            module.dynamic = True  # Build the grids from the input shape, so any size works
+
+    dummy_input = torch.zeros(1, 3, INFERENCE_SIZE, INFERENCE_SIZE)
+    with torch.no_grad():
+        network(dummy_input)  # Builds the Detect grids before tracing
+        if backend == "torchscript":
+            torch.jit.trace(network, dummy_input, strict=False).save(f"{base_path}.torchscript")
+        else:
+            torch.onnx.export(
+                network, dummy_input, f"{base_path}.onnx",
+                opset_version=12,
+                input_names=["images"],
+                output_names=["output0"],
+                dynamic_axes={
+                    "images": {0: "batch", 2: "height", 3: "width"},
+                    "output0": {0: "batch", 1: "anchors"},
+                },
+            )
+
+    if backend == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(f"{base_path}.onnx", f"{base_path}.int8.onnx", weight_type=QuantType.QUInt8)
+
+    names = torch_model.names
+    if isinstance(names, dict):
+        names = [names[class_id] for class_id in range(len(names))]
+    with open(f"{base_path}.meta.json", "w") as f:
+        json.dump({"names": names, "stride": int(network.stride.max())}, f)
+
+    print(f"{Colors.GREEN}Exported in {time.monotonic() - export_start_time:.1f}s.{Colors.ENDC}")
+
+
+def inference_shape(frames, size, stride):
+    """
+    AutoShape's input shape for a batch: every frame scaled so its longest
+    side is `size`, the largest of them rounded up to a multiple of the
+    stride. A 16:9 frame at 640 gives 384x640, not a 640x640 square.
+    """
+    scaled = [[int(dim * size / max(frame.shape[:2])) for dim in frame.shape[:2]] for frame in frames]
+    return [-(-max(dims) // stride) * stride for dims in zip(*scaled)]
+
+
+def letterbox(frame, shape):
+    """
+    Resizes a frame to fit `shape` (height, width) keeping its aspect ratio and
+    pads the rest with gray, like yolov5. Returns (image, ratio, (pad_x, pad_y)).
+    """
+    height, width = frame.shape[:2]
+    ratio = min(shape[0] / height, shape[1] / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    pad_x, pad_y = (shape[1] - new_width) / 2, (shape[0] - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (pad_x, pad_y)
+
+
+def non_max_suppression(predictions):
+    """
+    yolov5's NMS for raw (B, N, 5 + classes) predictions [cx, cy, w, h, obj, cls...]:
+    the confidence is obj * cls of the best class and suppression is per class.
+    Returns one (N, 6) tensor [x1, y1, x2, y2, conf, cls] per image.
+    """
+    output = []
+    for prediction in predictions:
+        prediction = prediction[prediction[:, 4] > CONF_THRESHOLD]
+        confidence, class_id = (prediction[:, 5:] * prediction[:, 4:5]).max(1)
+        keep = confidence > CONF_THRESHOLD
+        prediction, confidence, class_id = prediction[keep], confidence[keep], class_id[keep]
+
+        centers, sizes = prediction[:, :2], prediction[:, 2:4]
+        boxes = torch.cat([centers - sizes / 2, centers + sizes / 2], 1)
+        kept = torchvision.ops.batched_nms(boxes, confidence, class_id, IOU_THRESHOLD)[:MAX_DETECTIONS]
+        output.append(torch.cat([boxes[kept], confidence[kept, None], class_id[kept, None].float()], 1))
+    return output
+
+
+def scale_boxes(boxes, ratio, pad, shape):
+    """Maps boxes from the letterboxed input back onto the original frame, in place."""
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes[:, :4] /= ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clamp(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clamp(0, shape[0])
+    return boxes
+
+
+class ExportedModel:
+    """
+    Runs an exported yolov5 model with TorchScript or ONNX Runtime and does
+    the letterboxing, NMS and box scaling that AutoShape does for the torch
+    backend. Calls take an RGB frame or a list of them and a size, like
+    AutoShape, and letterbox to the same rectangular input shape.
+    """
+
+    def __init__(self, backend, base_path):
+        self.backend = backend
+        self.base_path = base_path
+        self.session = None  # ONNX Runtime session, created on the first call
+        self.session_threads = 0
+        self.module = None
+
+        with open(f"{base_path}.meta.json") as f:
+            metadata = json.load(f)
+        self.names = metadata["names"]
+        self.stride = metadata["stride"]
+
+        if backend == "torchscript":
+            self.module = torch.jit.load(f"{base_path}.torchscript", map_location="cpu")
+            self.module.eval()
+
+    def set_num_threads(self, threads):
+        """
+        ONNX Runtime sizes its thread pool when the session is created, so
+        this drops the session and the next call builds one with `threads`.
+        """
+        if self.backend == "torchscript":
+            return  # Follows torch.set_num_threads()
+        self.session_threads = threads
+        self.session = None
+
+    def start_session(self):
+        # Deferred until after the fork (configure_worker or the first call), so
+        # with MODEL_PRELOAD no session and no thread pool exist in the master
+        if self.module is not None:
+            return
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.session_threads or WORKER_THREADS or 0
+        self.session = onnxruntime.InferenceSession(
+            f"{self.base_path}.{EXPORT_EXTENSIONS[self.backend]}", options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, frames, size=INFERENCE_SIZE):
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+
+        preprocess_start = time.monotonic()
+        shape = inference_shape(frames, size, self.stride)
+        images, transforms = [], []
+        for frame in frames:
+            image, ratio, pad = letterbox(frame, shape)
+            images.append(image)
+            transforms.append((ratio, pad))
+        # RGB HWC uint8 -> RGB CHW float32 in [0, 1]
+        inputs = np.ascontiguousarray(np.stack(images).transpose(0, 3, 1, 2)).astype(np.float32) / 255
+
+        inference_start = time.monotonic()
+        if self.module is not None:
+            with torch.no_grad():
+                predictions = self.module(torch.from_numpy(inputs))
+            if isinstance(predictions, (list, tuple)):
+                predictions = predictions[0]
+        else:
+            if self.session is None:
+                self.start_session()
+            predictions = torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+        nms_start = time.monotonic()
+        xyxy = [
+            scale_boxes(boxes, ratio, pad, frame.shape)
+            for boxes, (ratio, pad), frame in zip(non_max_suppression(predictions), transforms, frames)
+        ]
+        nms_end = time.monotonic()
+
+        per_image_ms = 1000 / len(frames)
+        timings = (
+            (inference_start - preprocess_start) * per_image_ms,
+            (nms_start - inference_start) * per_image_ms,
+            (nms_end - nms_start) * per_image_ms,
+        )
+        return ExportedResults(xyxy=xyxy, t=timings, s=inputs.shape, names=self.names)
+
+
+def load_exported_model(backend):
+    """
+    Loads the cached export for `backend`, exporting the weights first if it
+    isn't cached yet. Returns (model, source) where source is "cache" or "export".
+    """
+    base_path = exported_model_base()
+    artifact_path = f"{base_path}.{EXPORT_EXTENSIONS[backend]}"
+    if os.path.exists(artifact_path) and os.path.exists(f"{base_path}.meta.json"):
+        print(f"{Colors.BLUE}Using cached export {artifact_path}{Colors.ENDC}")
+        source = "cache"
+    else:
+        export_model(backend, base_path)
+        gc.collect()  # Drop the torch model the export was traced from
+        source = "export"
+    return ExportedModel(backend, base_path), source
+
+
+def warmup_model(loaded_model):
+    """
+    Runs WARMUP_RUNS dummy inferences at each of WARMUP_RESOLUTIONS so the
+    one-time allocation costs are paid before the first real request.
+    """
+    for resolution in WARMUP_RESOLUTIONS.split(","):
+        width, height = (int(value) for value in resolution.strip().lower().split("x"))
+        dummy_frame = np.zeros((height, width, 3), dtype=np.uint8)
+        for _ in range(WARMUP_RUNS):
+            with model_lock:
+                apply_worker_threads()
+                loaded_model(dummy_frame, size=INFERENCE_SIZE)
+
+
+def finish_model_warmup():
+    """Warms the loaded model up, then marks it READY and releases waiting requests."""
+    global MODEL_STATUS, MODEL_ERROR, MODEL_WARMUP_TIME
+
+    try:
+        # Warm up before accepting requests
+        if WARMUP_RUNS > 0:
+            warmup_start_time = time.monotonic()
+            warmup_model(model)
+            MODEL_WARMUP_TIME = round(time.monotonic() - warmup_start_time, 3)
+            print(f"{Colors.GREEN}Model warmed up in {MODEL_WARMUP_TIME}s.{Colors.ENDC}")
+
+        MODEL_STATUS = "READY"
+        print(f"{Colors.GREEN}{Colors.BOLD}Model ready. Status: READY{Colors.ENDC}")
+
+    except Exception as e:
+        MODEL_STATUS = "FAILED"
+        MODEL_ERROR = str(e)
+        print(f"{Colors.FAIL}{Colors.BOLD}FATAL: Model warmup failed. Error: {e}{Colors.ENDC}")
+
+    finally:
+        if MODEL_LOADS:
+            MODEL_LOADS[-1].update(
+                status=MODEL_STATUS,
+                warmup_ms=MODEL_WARMUP_TIME * 1000,
+                rss_after_mb=read_rss_mb(),
+            )
+        MODEL_SETTLED.set()
+
+
+def load_model_background(warmup=True, use_cache=True):
     """
     Function running in a separate thread to load the model
     without blocking the Flask server from starting.
+    With warmup=False the model is left WARMING_UP for finish_model_warmup().
+    use_cache=False ignores the fast-reload cache to measure a cold load.
     """
     global model, MODEL_STATUS, MODEL_ERROR, MODEL_LOAD_TIME
     
-    print(f"{Colors.BLUE}Loading 'yolov5n' from LOCAL files...{Colors.ENDC}")
+    print(f"{Colors.BLUE}Loading 'yolov5n' from LOCAL files ({INFERENCE_BACKEND} backend)...{Colors.ENDC}")
+    load_record = {
+        "load": (MODEL_LOADS[-1]["load"] + 1) if MODEL_LOADS else 1,
+        "backend": INFERENCE_BACKEND,
+        "started_at": time.time(),
+        "rss_before_mb": read_rss_mb(),
+    }
+    MODEL_LOADS.append(load_record)
     
     # Start timer for model loading
     load_start_time = time.monotonic()
 
     try:
-        print(f"{Colors.BLUE}Downloading/Loading 'yolov5n' from Ultralytics GitHub...{Colors.ENDC}")
-        
-        # Load the model
-        # trust_repo=True allows it to run without prompt (required for automation)
-        loaded_model = hub.load(
-            '/app/ultralytics/yolov5',  # Path to the cloned repo (contains hubconf.py)
-            'custom',                   # Use 'custom' to load specific weights file
-            path='/app/yolov5n.pt',     # Path to your local .pt file
-            source='local'              # Tells torch to look locally, not GitHub
-        )
+        if INFERENCE_BACKEND not in INFERENCE_BACKENDS:
+            raise ValueError(f"INFERENCE_BACKEND must be one of {', '.join(INFERENCE_BACKENDS)}")
+
+        if INFERENCE_BACKEND == "torch":
+            loaded_model, source = load_torch_model_cached(use_cache)
+        else:
+            loaded_model, source = load_exported_model(INFERENCE_BACKEND)
         
         # Calculate load duration
-        MODEL_LOAD_TIME = round(time.monotonic() - load_start_time)
-        
+        load_seconds = time.monotonic() - load_start_time
+        MODEL_LOAD_TIME = round(load_seconds)
+        load_record.update(source=source, load_ms=round(load_seconds * 1000, 1))
+        print(f"{Colors.GREEN}Model loaded from {source} in {load_seconds:.2f}s.{Colors.ENDC}")
+
         # Assign to global variable
         model = loaded_model
-        MODEL_STATUS = "READY"
-        print(f"{Colors.GREEN}{Colors.BOLD}Model loaded successfully in {MODEL_LOAD_TIME}s. Status: READY{Colors.ENDC}")
+        MODEL_STATUS = "WARMING_UP"
 
     except Exception as e:
         MODEL_STATUS = "FAILED"
         MODEL_ERROR = str(e)
         print(f"{Colors.FAIL}{Colors.BOLD}FATAL: Could not load model. Error: {e}{Colors.ENDC}")
+        load_record.update(status=MODEL_STATUS, error=MODEL_ERROR, rss_after_mb=read_rss_mb())
+        MODEL_SETTLED.set()
+        return
+
+    if warmup:
+        finish_model_warmup()
+
+
+# --- Model Lifecycle ---
+
+def read_rss_mb():
+    """Resident set size of this process in MiB, from /proc/self/status."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def release_free_memory():
+    """
+    Collects garbage and asks glibc to give freed heap pages back to the OS;
+    without malloc_trim they stay in its arenas and RSS doesn't drop.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # Not glibc
+
+
+def unload_model():
+    """Drops the model and returns its memory to the OS. Returns the unload record."""
+    global model, MODEL_STATUS
+
+    rss_before_mb = read_rss_mb()
+    unload_start_time = time.monotonic()
+    with model_lock:  # Lets a running inference finish first
+        model = None
+        MODEL_STATUS = "UNLOADED"
+    release_free_memory()
+    rss_after_mb = read_rss_mb()
+    print(f"{Colors.BLUE}Model unloaded, RSS {rss_before_mb} -> {rss_after_mb} MiB.{Colors.ENDC}")
+
+    return {
+        "status": MODEL_STATUS,
+        "unload_ms": round((time.monotonic() - unload_start_time) * 1000, 1),
+        "rss_before_mb": rss_before_mb,
+        "rss_after_mb": rss_after_mb,
+        "freed_mb": round(rss_before_mb - rss_after_mb, 1) if rss_before_mb and rss_after_mb else None,
+    }
+
+
+def available_cpus():
+    """Number of CPUs this process may run on."""
+    return len(os.sched_getaffinity(0))
+
+
+def configure_worker(worker_count):
+    """
+    Called in every gunicorn worker right after fork (see gunicorn.conf.py).
+    Splits the pod's CPUs between the workers so their intra-op thread pools
+    don't oversubscribe the CPU limit, and warms up a preloaded model.
+    """
+    global WORKER_COUNT
+    WORKER_COUNT = worker_count
+    cpu_tuner.retune()
+    cpu_tuner.start()
+    print(f"{Colors.BLUE}Worker {os.getpid()}: {WORKER_THREADS} inference threads.{Colors.ENDC}")
+
+    if hasattr(model, "start_session"):
+        model.start_session()  # ONNX Runtime session, never created in the master
+
+    if MODEL_PRELOAD and MODEL_STATUS == "WARMING_UP":
+        threading.Thread(target=finish_model_warmup, daemon=True).start()
+
+
+# --- CPU Autotuning ---
+
+def read_cgroup_file(*parts):
+    """Returns the stripped content of a file under CGROUP_ROOT, or None if it doesn't exist."""
+    try:
+        with open(os.path.join(CGROUP_ROOT, *parts)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_cpu_quota():
+    """
+    Returns (cgroup_version, quota_cpus) for this container. quota_cpus is
+    None when no CPU limit is set. Reads cpu.max on cgroup v2 and
+    cpu.cfs_quota_us / cpu.cfs_period_us on cgroup v1.
+    """
+    cpu_max = read_cgroup_file("cpu.max")
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max":
+            return "v2", None
+        return "v2", int(quota) / int(period or 100000)
+
+    for controller in ("cpu", "cpu,cpuacct"):
+        quota = read_cgroup_file(controller, "cpu.cfs_quota_us")
+        period = read_cgroup_file(controller, "cpu.cfs_period_us")
+        if quota is not None and period is not None:
+            if int(quota) < 0:
+                return "v1", None
+            return "v1", int(quota) / int(period)
+
+    return None, None
+
+
+def read_cpu_throttling():
+    """Returns CFS throttling counters (nr_periods, nr_throttled, throttled_usec), or {} if unavailable."""
+    cpu_stat = read_cgroup_file("cpu.stat")
+    if cpu_stat is None:
+        cpu_stat = read_cgroup_file("cpu", "cpu.stat") or read_cgroup_file("cpu,cpuacct", "cpu.stat")
+    if cpu_stat is None:
+        return {}
+
+    counters = {}
+    for line in cpu_stat.splitlines():
+        key, _, value = line.partition(" ")
+        if key in ("nr_periods", "nr_throttled", "throttled_usec"):
+            counters[key] = int(value)
+        elif key == "throttled_time":  # cgroup v1 reports nanoseconds
+            counters["throttled_usec"] = int(value) // 1000
+    return counters
+
+
+inference_thread_state = threading.local()
+
+
+def apply_worker_threads():
+    """
+    Applies WORKER_THREADS on the calling thread, right before it runs the
+    model (under model_lock). torch's intra-op thread count is per thread: a
+    thread that has already run an op keeps its count when another thread
+    calls torch.set_num_threads(), so the tuner only publishes the target.
+    """
+    threads = WORKER_THREADS
+    if threads and getattr(inference_thread_state, "threads", None) != threads:
+        torch.set_num_threads(threads)
+        inference_thread_state.threads = threads
+        APPLIED_THREADS[threading.current_thread().name] = torch.get_num_threads()
+
+
+class CpuTuner:
+    """
+    Keeps the inference thread count in line with the container's CPU quota.
+    The quota is re-read every CPU_TUNE_INTERVAL_SEC seconds, so in-place VPA
+    resizes of the CPU limit are picked up without restarting the pod. The
+    new count is published in WORKER_THREADS and applied by each inference
+    thread on its next model call (see apply_worker_threads).
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.cgroup_version = None
+        self.quota_cpus = None
+        self.effective_cpus = None
+        self.retunes = 0
+        self.changes = deque(maxlen=20)
+        self.last_check = None
+        self.last_throttling = {}
+        self.throttled_ratio = None
+        self._thread = None
+
+    def start(self):
+        """Starts the periodic re-check thread (once per process)."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.retune()
+            except Exception as e:
+                print(f"{Colors.WARNING}CPU retune failed: {e}{Colors.ENDC}")
+
+    def retune(self):
+        """Re-reads the CPU quota and publishes a new thread count if it changed. Returns the status."""
+        global WORKER_THREADS
+
+        with self.lock:
+            cgroup_version, quota_cpus = read_cpu_quota()
+            cpus = available_cpus()
+            if quota_cpus is not None:
+                # Round down: a 1.5 CPU quota can't keep 2 threads busy without throttling
+                cpus = max(1, min(cpus, int(quota_cpus)))
+            threads = max(1, cpus // WORKER_COUNT)
+
+            throttling = read_cpu_throttling()
+            periods = throttling.get("nr_periods", 0) - self.last_throttling.get("nr_periods", 0)
+            throttled = throttling.get("nr_throttled", 0) - self.last_throttling.get("nr_throttled", 0)
+            self.throttled_ratio = round(throttled / periods, 3) if periods > 0 else None
+            self.last_throttling = throttling
+
+            self.cgroup_version = cgroup_version
+            self.quota_cpus = quota_cpus
+            self.effective_cpus = cpus
+            self.last_check = time.time()
+            self.retunes += 1
+
+            if threads != WORKER_THREADS:
+                # OpenCV's pool is process-wide; torch's is applied per inference thread
+                cv2.setNumThreads(threads)
+                # Never change the pool size while an inference is running on it
+                with model_lock:
+                    if hasattr(model, "set_num_threads"):
+                        model.set_num_threads(threads)
+                self.changes.append({"at": self.last_check, "from": WORKER_THREADS, "to": threads,
+                                     "quota_cpus": quota_cpus})
+                print(f"{Colors.BLUE}Inference threads: {WORKER_THREADS} -> {threads} "
+                      f"(CPU quota: {quota_cpus}).{Colors.ENDC}")
+                WORKER_THREADS = threads
+
+        return self.status()
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "cgroup_version": self.cgroup_version,
+            "quota_cpus": self.quota_cpus,
+            "affinity_cpus": available_cpus(),
+            "effective_cpus": self.effective_cpus,
+            "workers": WORKER_COUNT,
+            "threads": WORKER_THREADS,
+            # What the inference threads actually run with, as of their last model call
+            "applied_threads": dict(APPLIED_THREADS),
+            "throttling": self.last_throttling,
+            "throttled_ratio_since_last_check": self.throttled_ratio,
+            "retune_interval_sec": self.interval,
+            "last_check": self.last_check,
+            "checks": self.retunes,
+            "thread_changes": list(self.changes),
+        }
+
+
+cpu_tuner = CpuTuner(CPU_TUNE_INTERVAL_SEC)
+
+
+if MODEL_PRELOAD:
+    # Runs in the gunicorn master before it forks. A single thread keeps
+    # OpenMP's pool uninitialised, which is not safe to use across fork().
+    torch.set_num_threads(1)
+    load_model_background(warmup=False)
+    if hasattr(model, "share_memory"):
+        # Move the weights into shared memory so no worker ever copies them.
+        model.share_memory()
+    # An exported ONNX model has no session yet; each worker creates its own
+    # in configure_worker, after the fork.
+else:
+    # Single process: size the thread pool now and keep following the quota.
+    # With preload the workers do this after the fork instead.
+    cpu_tuner.retune()
+    cpu_tuner.start()
+
+    # Start the loading process in a background thread immediately
+    loader_thread = threading.Thread(target=load_model_background, daemon=True)
+    loader_thread.start()
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list, or None if it is empty."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+# --- Inference Batching ---
+
+class PendingFrame:
+    """A frame waiting in the batching queue, plus a slot for its result."""
+
+    def __init__(self, frame, size):
+        self.frame = frame
+        self.size = size
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+
+
+class InferenceBatcher:
+    """
+    Collects frames from concurrent requests and runs them through the model
+    together. A single inference thread takes the first waiting frame, then
+    keeps adding frames until the batch holds `max_batch_size` frames or
+    `max_wait_ms` has passed, and calls the model once for the whole batch.
+    """
+
+    def __init__(self, max_batch_size, max_wait_ms):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._batch_sizes = {}
+        self._queue_delays_ms = deque(maxlen=1000)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, size=INFERENCE_SIZE):
+        """Queues a frame and blocks until its detection result is ready."""
+        pending = PendingFrame(frame, size)
+        self._queue.put(pending)
+        pending.done.wait()
+        return pending.result
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started_at = time.monotonic()
+            delays_ms = [round((started_at - p.enqueued_at) * 1000, 2) for p in batch]
+
+            try:
+                # One model call per inference size in the batch
+                results = [None] * len(batch)
+                for size in {p.size for p in batch}:
+                    indexes = [i for i, p in enumerate(batch) if p.size == size]
+                    for i, result in zip(indexes, detect_frames([batch[i].frame for i in indexes], size)):
+                        results[i] = result
+            except Exception as e:
+                results = [{"success": False, "error": f"Inference failed: {str(e)}"}] * len(batch)
 
-# Start the loading process in a background thread immediately
-loader_thread = threading.Thread(target=load_model_background, daemon=True)
-loader_thread.start()
+            with self._stats_lock:
+                self._batches += 1
+                self._frames += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                self._queue_delays_ms.extend(delays_ms)
+
+            for pending, result, delay_ms in zip(batch, results, delays_ms):
+                pending.result = dict(result, batch_size=len(batch), queue_ms=delay_ms)
+                pending.done.set()
+
+    def stats(self):
+        with self._stats_lock:
+            delays = sorted(self._queue_delays_ms)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "frames": self._frames,
+                "avg_batch_size": round(self._frames / self._batches, 2) if self._batches else 0,
+                "batch_size_counts": self._batch_sizes,
+                "queue_delay_ms": {
+                    "avg": round(sum(delays) / len(delays), 2) if delays else None,
+                    "p50": percentile(delays, 50),
+                    "p95": percentile(delays, 95),
+                    "max": delays[-1] if delays else None,
+                },
+            }
+
+
+batcher = None
+batcher_lock = threading.Lock()
+
+def get_batcher():
+    """Returns the process-wide batcher, starting its thread on first use."""
+    global batcher
+    if batcher is None:
+        with batcher_lock:
+            if batcher is None:
+                batcher = InferenceBatcher(BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+    return batcher
+
+
+# --- Result Cache ---
+
+def model_identity():
+    """Identifies the model and settings that produced a result, for cache keys."""
+    try:
+        weights_mtime = os.path.getmtime(MODEL_WEIGHTS_PATH)
+    except OSError:
+        weights_mtime = 0
+    return f"{MODEL_WEIGHTS_PATH}:{weights_mtime}:{INFERENCE_BACKEND}"
+
+
+class ResultCache:
+    """
+    Content-addressed LRU cache of detection results.
+
+    Keys hash the uploaded file bytes when the frame was decoded from an
+    upload (far smaller than the pixels of a 4K frame), otherwise the raw
+    pixels, together with the frame shape and the model identity. XXH3 is
+    used when xxhash is installed, BLAKE2 otherwise. The cache is bounded
+    both by entry count and by the serialized size of the stored results.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def key(self, frame, settings="", encoded=None):
+        digest = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+        digest.update(f"{model_identity()}|{settings}|{frame.shape}|{frame.dtype}".encode())
+        if encoded is not None:
+            digest.update(encoded)
+        else:
+            # Hashes the pixel buffer in place; only non-contiguous views are copied.
+            digest.update(np.ascontiguousarray(frame).data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_ENTRIES, RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_ENTRIES > 0 else None
+
+
+# --- Video Ingestion ---
+
+class FrameReader:
+    """
+    Decodes a video file or stream URL (RTMP/HLS/...) in a producer thread
+    and feeds a bounded queue of (frame, decoded_at) tuples.
+
+    When the queue is full, `drop_policy` decides what happens:
+    "drop_oldest" discards the stalest queued frame so inference always sees
+    recent video, "drop_newest" discards the frame just decoded, and "block"
+    pauses decoding until inference catches up. With `realtime`, frames are
+    released at the source frame rate, so a file behaves like a live stream.
+    """
+
+    def __init__(self, source, queue_size, drop_policy, realtime=False):
+        self.source = source
+        self.drop_policy = drop_policy
+        self.realtime = realtime
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.decoded = 0
+        self.dropped = 0
+        self.source_fps = None
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _put_blocking(self, item):
+        while not self._stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _put(self, item):
+        if self.drop_policy == "block":
+            self._put_blocking(item)
+        elif self.drop_policy == "drop_newest":
+            try:
+                self.frames.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            while True:
+                try:
+                    self.frames.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self.frames.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _run(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                self.error = f"Could not open video source '{self.source}'"
+                return
+
+            self.source_fps = capture.get(cv2.CAP_PROP_FPS) or None
+            frame_interval = 1 / self.source_fps if self.realtime and self.source_fps else 0
+            next_release = time.monotonic()
+
+            while not self._stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                if frame_interval:
+                    next_release += frame_interval
+                    delay = next_release - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.decoded += 1
+                self._put((frame, time.monotonic()))
+        finally:
+            capture.release()
+            # End-of-stream marker, never dropped
+            self._put_blocking(None)
+
+
+# --- Image Decoding ---
+
+RAW_FRAME_CONTENT_TYPE = "application/octet-stream"
+
+def decode_request_frame():
+    """
+    Turns the current request into a BGR frame without intermediate copies.
+
+    Accepts either an encoded image (JPEG/PNG/...) in the 'image' multipart
+    field, decoded straight from the upload buffer by cv2.imdecode, or a
+    pre-decoded frame sent as a raw body with Content-Type
+    application/octet-stream plus 'X-Frame-Shape: H,W,C' and optional
+    'X-Frame-Dtype' (default uint8) headers, wrapped without copying.
+
+    Returns (frame, encoded, decode_ms, error_message); `encoded` is the
+    uploaded file's bytes (None for raw frames) and frame is None on error.
+    """
+    start_time = time.monotonic()
+    encoded = None
+
+    if request.mimetype == RAW_FRAME_CONTENT_TYPE:
+        shape_header = request.headers.get("X-Frame-Shape")
+        if not shape_header:
+            return None, None, 0.0, "Raw frames need an 'X-Frame-Shape: H,W,C' header"
+        try:
+            shape = tuple(int(dim) for dim in shape_header.split(","))
+            dtype = np.dtype(request.headers.get("X-Frame-Dtype", "uint8"))
+            frame = np.frombuffer(request.get_data(cache=False), dtype=dtype).reshape(shape)
+        except (TypeError, ValueError) as e:
+            return None, None, 0.0, f"Invalid raw frame: {e}"
+    else:
+        if 'image' not in request.files:
+            return None, None, 0.0, "No 'image' file part"
+
+        file = request.files['image']
+        if file.filename == '':
+            return None, None, 0.0, "No selected file"
+
+        # IMREAD_COLOR always yields 3-channel BGR (alpha and grayscale are
+        # converted); EXIF rotation is ignored, as PIL's Image.open did.
+        encoded = file.read()
+        buffer = np.frombuffer(encoded, dtype=np.uint8)
+        frame = cv2.imdecode(buffer, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+        if frame is None:
+            return None, None, 0.0, "Could not decode image"
+
+    decode_ms = round((time.monotonic() - start_time) * 1000, 2)
+    return frame, encoded, decode_ms, None
 
 
 # --- API Endpoints ---
 
-@app.route("/detect/time/<int:duration>", methods=["POST"])
-def handle_image_upload_timed(duration):
-    # --- INLINE WAIT LOOP ---
-    # Get timeout from ENV, default to 60 seconds
-    wait_timeout = int(os.environ.get("MODEL_LOAD_TIMEOUT", 60))
-    start_wait = time.time()
-    
-    while MODEL_STATUS == "LOADING":
-        if time.time() - start_wait > wait_timeout:
-            return jsonify({
-                "success": False, 
-                "error": f"Timeout ({wait_timeout}s) waiting for model to load."
-            }), 503
-        time.sleep(0.1) # Check every 100ms
+def parse_inference_options(params):
+    """
+    Reads the per-request inference settings from `params`: size (longest
+    side of the model input, defaults to INFERENCE_SIZE) and tile ("1" to
+    split the frame into tiles, defaults to TILE_INFERENCE).
+    Returns (size, tiled, error_message).
+    """
+    try:
+        size = int(params.get("size", INFERENCE_SIZE))
+    except (TypeError, ValueError):
+        return None, None, "size must be an integer"
+    if not 32 <= size <= 7680:
+        return None, None, "size must be between 32 and 7680"
+
+    tiled = str(params.get("tile", "1" if TILE_INFERENCE else "0")).lower() in ("1", "true")
+    return size, tiled, None
+
+
+def wait_for_model(wait_timeout):
+    """
+    Blocks until the model has finished loading and warming up.
+    A timeout of 0 waits forever. Returns an error response, or None once READY.
+    """
+    if not MODEL_SETTLED.wait(wait_timeout or None):
+        return jsonify({
+            "success": False,
+            "error": f"Timeout ({wait_timeout}s) waiting for model to load."
+        }), 503
 
     # If loading failed, return the specific error
     if MODEL_STATUS == "FAILED":
         return jsonify({"success": False, "error": f"Model load failed: {MODEL_ERROR}"}), 500
+    if MODEL_STATUS == "UNLOADED":
+        return jsonify({"success": False, "error": "Model is unloaded. Call /model/load first."}), 503
+    return None
 
-    # --- Proceed with Request ---
-    if 'image' not in request.files:
-        return jsonify({"success": False, "error": "No 'image' file part in the request"}), 400
 
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"success": False, "error": "No selected file"}), 400
+@app.route("/ready", methods=["GET"])
+def readiness_probe():
+    """Readiness probe for Kubernetes/Knative: 200 only once the model is READY."""
+    body = {
+        "status": MODEL_STATUS,
+        "backend": INFERENCE_BACKEND,
+        "pid": os.getpid(),
+        "worker_threads": WORKER_THREADS,
+        "model_loading_time_ms": MODEL_LOAD_TIME * 1000,
+        "model_warmup_time_ms": MODEL_WARMUP_TIME * 1000,
+    }
+    if MODEL_STATUS == "READY":
+        return jsonify(body), 200
+    if MODEL_STATUS == "FAILED":
+        body["error"] = MODEL_ERROR
+    return jsonify(body), 503
+
+
+@app.route("/model/load", methods=["GET", "POST"])
+def load_model_endpoint():
+    """
+    Loads the model after an unload (or a failed load) and returns the load
+    record. Query parameters: cache=0 to skip the fast-reload cache (cold
+    load) and wait=0 to return right away instead of waiting until READY.
+    """
+    global MODEL_STATUS, MODEL_ERROR
+
+    with model_lifecycle_lock:
+        if MODEL_STATUS in ("LOADING", "WARMING_UP", "READY"):
+            return jsonify({"success": False, "error": f"Model is already {MODEL_STATUS}. Unload it first."}), 409
+
+        MODEL_SETTLED.clear()
+        MODEL_STATUS = "LOADING"
+        MODEL_ERROR = None
+        use_cache = request.args.get("cache", "1") != "0"
+        threading.Thread(target=load_model_background, kwargs={"use_cache": use_cache}, daemon=True).start()
+
+    if request.args.get("wait", "1") == "0":
+        return jsonify({"success": True, "status": MODEL_STATUS}), 202
+
+    error_response = wait_for_model(int(os.environ.get("MODEL_LOAD_TIMEOUT", 6000)))
+    if error_response:
+        return error_response
+    return jsonify(dict(MODEL_LOADS[-1], success=True)), 200
+
+
+@app.route("/model/unload", methods=["GET", "POST"])
+def unload_model_endpoint():
+    """Frees the model and reports RSS before and after."""
+    with model_lifecycle_lock:
+        if MODEL_STATUS in ("LOADING", "WARMING_UP"):
+            return jsonify({"success": False, "error": f"Model is {MODEL_STATUS}. Try again once it settles."}), 409
+        if MODEL_STATUS == "UNLOADED":
+            return jsonify({"success": False, "error": "Model is already unloaded."}), 409
+        return jsonify(dict(unload_model(), success=True)), 200
+
+
+@app.route("/model/status", methods=["GET"])
+def model_status():
+    """Current model state and the records of past loads (cold vs. cached, timings, RSS)."""
+    return jsonify({
+        "status": MODEL_STATUS,
+        "backend": INFERENCE_BACKEND,
+        "pid": os.getpid(),
+        "rss_mb": read_rss_mb(),
+        "loads": list(MODEL_LOADS),
+    }), 200
+
+
+def format_event(data, event, stream_format):
+    """Serialises one streamed record as a server-sent event or an NDJSON line."""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event == "summary":
+        data = {"summary": data}
+    return json.dumps(data) + "\n"
+
+
+def summarize_timed_run(wall_times_ms, elapsed_s):
+    """Achieved FPS, latency percentiles and jitter of a timed detection run."""
+    latencies = sorted(wall_times_ms)
+    # Jitter: mean absolute difference between consecutive iterations
+    jitter_ms = (
+        statistics.fmean(abs(b - a) for a, b in zip(wall_times_ms, wall_times_ms[1:]))
+        if len(wall_times_ms) > 1 else 0.0
+    )
+    return {
+        "iterations": len(wall_times_ms),
+        "elapsed_s": round(elapsed_s, 3),
+        "fps": round(len(wall_times_ms) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "latency_ms": {
+            "min": latencies[0] if latencies else None,
+            "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+            "stdev": round(statistics.pstdev(latencies), 2) if latencies else None,
+        },
+        "jitter_ms": round(jitter_ms, 2),
+    }
+
+
+@app.route("/detect/time/<int:duration>", methods=["POST"])
+def handle_image_upload_timed(duration):
+    """
+    Runs detection on the uploaded frame in a loop for `duration` seconds,
+    streaming per-iteration timings and a final summary. Query parameters:
+    format ("ndjson" or "sse"), sleep_ms (pause between iterations,
+    defaults to DETECT_LOOP_SLEEP_MS), size and tile.
+    """
+    # Get timeout from ENV, default to 60 seconds
+    error_response = wait_for_model(int(os.environ.get("MODEL_LOAD_TIMEOUT", 60)))
+    if error_response:
+        return error_response
 
+    stream_format = request.args.get("format", "ndjson")
+    if stream_format not in ("ndjson", "sse"):
+        return jsonify({"success": False, "error": "format must be 'ndjson' or 'sse'"}), 400
     try:
-        img_pil = Image.open(file.stream)
-        frame = np.array(img_pil)
+        sleep_s = float(request.args.get("sleep_ms", DETECT_LOOP_SLEEP_MS)) / 1000
+    except ValueError:
+        return jsonify({"success": False, "error": "sleep_ms must be a number"}), 400
+    size, tiled, error_message = parse_inference_options(request.args)
+    if error_message:
+        return jsonify({"success": False, "error": error_message}), 400
 
-        if len(frame.shape) == 3 and frame.shape[2] == 3:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        elif len(frame.shape) == 3 and frame.shape[2] == 4:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+    # --- Proceed with Request ---
+    try:
+        frame, _, decode_ms, error_message = decode_request_frame()
+        if frame is None:
+            return jsonify({"success": False, "error": error_message}), 400
+    except Exception as e:
+        print(f"{Colors.FAIL}An unexpected error occurred: {e}{Colors.ENDC}")
+        return jsonify({"success": False, "error": str(e)}), 500
 
+    def generate():
         # --- Timed Processing Loop ---
         start_time = time.monotonic()
+        wall_times_ms = []
         print(f"{Colors.CYAN}--- Starting timed processing for {duration}s ---{Colors.ENDC}")
-        
+
         while time.monotonic() - start_time <= duration:
-            analysis_data = detect_one_frame(frame)
+            iteration_start = time.monotonic()
+            analysis_data = detect_one_frame(frame, size, tiled)
+            wall_ms = round((time.monotonic() - iteration_start) * 1000, 2)
+
             if not analysis_data.get("success"):
                 error_message = analysis_data.get("error", "Unknown error.")
                 print(f"{Colors.FAIL}Error in loop: {error_message}{Colors.ENDC}")
-                return jsonify({"success": False, "error": error_message}), 500
-            
-            time.sleep(0.01)
+                yield format_event({"success": False, "error": error_message}, "error", stream_format)
+                return
 
-        print(f"{Colors.GREEN}--- Timed processing finished. ---{Colors.ENDC}")
-        return jsonify({"success": True, "message": "Timed detection complete."}), 200
+            wall_times_ms.append(wall_ms)
+            yield format_event({
+                "iteration": len(wall_times_ms),
+                "elapsed_s": round(time.monotonic() - start_time, 3),
+                "preprocess_ms": analysis_data.get("preprocess_ms"),
+                "inference_ms": analysis_data.get("inference_ms"),
+                "nms_ms": analysis_data.get("nms_ms"),
+                "postprocess_ms": analysis_data.get("postprocess_ms"),
+                "wall_ms": wall_ms,
+            }, "iteration", stream_format)
 
-    except Exception as e:
-        print(f"{Colors.FAIL}An unexpected error occurred: {e}{Colors.ENDC}")
-        return jsonify({"success": False, "error": str(e)}), 500
+            if sleep_s > 0:
+                time.sleep(sleep_s)
+
+        summary = summarize_timed_run(wall_times_ms, time.monotonic() - start_time)
+        summary.update({"success": True, "decode_ms": decode_ms, "sleep_ms": sleep_s * 1000})
+        print(f"{Colors.GREEN}--- Timed processing finished: {summary['fps']} FPS. ---{Colors.ENDC}")
+        yield format_event(summary, "summary", stream_format)
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@app.route("/detect/stream", methods=["POST"])
+def handle_video_stream():
+    """
+    Runs detection on a video file or stream URL, decoding frames in a
+    producer thread while this request consumes them. Parameters (JSON body
+    or query string): source, duration (seconds, 0 = until the video ends),
+    max_frames, queue_size, drop_policy, realtime, format ("ndjson"/"sse"),
+    size and tile.
+    Streams one record per analysed frame and a final summary.
+    """
+    error_response = wait_for_model(int(os.environ.get("MODEL_LOAD_TIMEOUT", 60)))
+    if error_response:
+        return error_response
+
+    params = {**request.args.to_dict(), **(request.get_json(silent=True) or {})}
+    source = params.get("source", STREAM_SOURCE)
+    drop_policy = params.get("drop_policy", STREAM_DROP_POLICY)
+    stream_format = params.get("format", "ndjson")
+    realtime = str(params.get("realtime", "0")).lower() in ("1", "true")
+    try:
+        duration = float(params.get("duration", 0))
+        max_frames = int(params.get("max_frames", 0))
+        queue_size = int(params.get("queue_size", STREAM_QUEUE_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "duration, max_frames and queue_size must be numbers"}), 400
+
+    if not source:
+        return jsonify({"success": False, "error": "No 'source' given and STREAM_SOURCE is not set"}), 400
+    if drop_policy not in STREAM_DROP_POLICIES:
+        return jsonify({"success": False, "error": f"drop_policy must be one of {', '.join(STREAM_DROP_POLICIES)}"}), 400
+    if stream_format not in ("ndjson", "sse"):
+        return jsonify({"success": False, "error": "format must be 'ndjson' or 'sse'"}), 400
+    if queue_size < 1:
+        return jsonify({"success": False, "error": "queue_size must be positive"}), 400
+    size, tiled, error_message = parse_inference_options(params)
+    if error_message:
+        return jsonify({"success": False, "error": error_message}), 400
+
+    reader = FrameReader(source, queue_size, drop_policy, realtime)
+
+    def generate():
+        start_time = time.monotonic()
+        latencies_ms = []
+        print(f"{Colors.CYAN}--- Starting video ingestion from {source} ({drop_policy}) ---{Colors.ENDC}")
+        reader.start()
+        last_frame_at = time.monotonic()
+
+        try:
+            while True:
+                if duration and time.monotonic() - start_time > duration:
+                    break
+                if max_frames and len(latencies_ms) >= max_frames:
+                    break
+
+                # Poll so a stalled source can't block past `duration` or hide a reader error
+                timeout = 0.5
+                if duration:
+                    timeout = max(0.01, min(timeout, start_time + duration - time.monotonic()))
+                try:
+                    item = reader.frames.get(timeout=timeout)
+                except queue.Empty:
+                    if reader.error or (duration and time.monotonic() - start_time > duration):
+                        break
+                    if time.monotonic() - last_frame_at > STREAM_STALL_TIMEOUT:
+                        reader.error = f"No frame decoded from '{source}' for {STREAM_STALL_TIMEOUT:g}s"
+                        break
+                    continue
+                if item is None:
+                    break
+                last_frame_at = time.monotonic()
+                frame, decoded_at = item
+
+                analysis_data = detect_one_frame(frame, size, tiled)
+                if not analysis_data.get("success"):
+                    error_message = analysis_data.get("error", "Unknown error.")
+                    print(f"{Colors.FAIL}Error in video loop: {error_message}{Colors.ENDC}")
+                    yield format_event({"success": False, "error": error_message}, "error", stream_format)
+                    return
+
+                # End-to-end: from the frame leaving the decoder to its result
+                latency_ms = round((time.monotonic() - decoded_at) * 1000, 2)
+                latencies_ms.append(latency_ms)
+                yield format_event({
+                    "frame": len(latencies_ms),
+                    "decoded": reader.decoded,
+                    "dropped": reader.dropped,
+                    "queue_depth": reader.frames.qsize(),
+                    "inference_ms": analysis_data.get("inference_ms"),
+                    "detections": len(analysis_data.get("detections") or []),
+                    "latency_ms": latency_ms,
+                }, "frame", stream_format)
+        finally:
+            reader.stop()
+
+        if reader.error:
+            yield format_event({"success": False, "error": reader.error}, "error", stream_format)
+            return
+
+        elapsed_s = time.monotonic() - start_time
+        latencies = sorted(latencies_ms)
+        summary = {
+            "success": True,
+            "source": source,
+            "source_fps": reader.source_fps,
+            "drop_policy": drop_policy,
+            "elapsed_s": round(elapsed_s, 3),
+            "frames_decoded": reader.decoded,
+            "frames_processed": len(latencies_ms),
+            "frames_dropped": reader.dropped,
+            "sustained_fps": round(len(latencies_ms) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+        print(f"{Colors.GREEN}--- Video ingestion finished: {summary['sustained_fps']} FPS, "
+              f"{reader.dropped} frames dropped. ---{Colors.ENDC}")
+        yield format_event(summary, "summary", stream_format)
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
 
 
 @app.route("/detect", methods=["POST"])
 def handle_image_upload():
-    # --- INLINE WAIT LOOP ---
     # Get timeout from ENV, default to 6000 seconds
-    wait_timeout = int(os.environ.get("MODEL_LOAD_TIMEOUT", 6000))
-    start_wait = time.time()
-    
-    while MODEL_STATUS == "LOADING":
-        if time.time() - start_wait > wait_timeout and wait_timeout != 0:
-            return jsonify({
-                "success": False, 
-                "error": f"Timeout ({wait_timeout}s) waiting for model to load."
-            }), 503
-        time.sleep(0.1)
-
-    # If loading failed, return the specific error
-    if MODEL_STATUS == "FAILED":
-        return jsonify({"success": False, "error": f"Model load failed: {MODEL_ERROR}"}), 500
+    error_response = wait_for_model(int(os.environ.get("MODEL_LOAD_TIMEOUT", 6000)))
+    if error_response:
+        return error_response
 
     # --- Proceed with Request ---
-    if 'image' not in request.files:
-        return jsonify({"success": False, "error": "No 'image' file part"}), 400
-
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({"success": False, "error": "No selected file"}), 400
-
     try:
         start_time = time.monotonic()
 
-        img_pil = Image.open(file.stream)
-        frame = np.array(img_pil)
+        size, tiled, error_message = parse_inference_options(request.args)
+        if error_message:
+            return jsonify({"success": False, "error": error_message}), 400
+
+        frame, encoded, decode_ms, error_message = decode_request_frame()
+        if frame is None:
+            return jsonify({"success": False, "error": error_message}), 400
+
+        # ?cache=0 bypasses the result cache to measure raw inference
+        analysis_data = None
+        cache_key = None
+        if result_cache is not None and request.args.get("cache", "1") != "0":
+            cache_key = result_cache.key(frame, f"size={size},tiled={tiled}", encoded)
+            analysis_data = result_cache.get(cache_key)
+        cache_hit = analysis_data is not None
 
-        if len(frame.shape) == 3 and frame.shape[2] == 3:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        elif len(frame.shape) == 3 and frame.shape[2] == 4:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+        if not cache_hit:
+            # Tiles are already batched into one model call
+            if BATCH_MAX_SIZE > 1 and not tiled:
+                analysis_data = get_batcher().submit(frame, size)
+            else:
+                analysis_data = detect_one_frame(frame, size, tiled)
 
-        analysis_data = detect_one_frame(frame) 
+            if cache_key and analysis_data.get("success"):
+                # Timings describe the inference that produced the result, not a later hit
+                cached = {k: v for k, v in analysis_data.items()
+                          if k not in ("batch_size", "queue_ms", "preprocess_ms", "inference_ms", "nms_ms", "postprocess_ms")}
+                result_cache.put(cache_key, cached)
 
         end_time = time.monotonic()
         total_time = round((end_time - start_time) * 1000, 2)
@@ -175,12 +1462,22 @@ def handle_image_upload():
             return jsonify({
                 "success": True,
                 "text": analysis_data.get("detections_summary"),
+                "backend": analysis_data.get("backend"),
+                "inference_size": size,
                 "total_server_time_ms": total_time,
+                "decode_ms": decode_ms,
                 "model_loading_time_ms": MODEL_LOAD_TIME*1000, 
+                "model_warmup_time_ms": MODEL_WARMUP_TIME*1000,
                 "model_preprocess_ms": analysis_data.get("preprocess_ms"),
                 "model_inference_ms": analysis_data.get("inference_ms"),
                 "model_nms_ms": analysis_data.get("nms_ms"),
-                "confidences": analysis_data.get("confidences")
+                "postprocess_ms": analysis_data.get("postprocess_ms"),
+                "confidences": analysis_data.get("confidences"),
+                "detections": analysis_data.get("detections"),
+                "batch_size": analysis_data.get("batch_size", 1),
+                "queue_ms": analysis_data.get("queue_ms", 0.0),
+                "cache_hit": cache_hit,
+                "tiling": analysis_data.get("tiling")
             }), 200
         else:
             return jsonify({
@@ -194,36 +1491,210 @@ def handle_image_upload():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/batching/stats", methods=["GET"])
+def get_batching_stats():
+    """Returns queue depth, batch-size distribution and queueing delay of the batcher."""
+    if BATCH_MAX_SIZE <= 1:
+        return jsonify({"enabled": False}), 200
+    return jsonify(dict(get_batcher().stats(), enabled=True)), 200
+
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """Returns hit/miss/eviction counters of the result cache."""
+    if result_cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify(dict(result_cache.stats(), enabled=True)), 200
+
+
+@app.route("/cpu", methods=["GET"])
+def get_cpu_status():
+    """Returns the CPU quota, the inference thread count and the CFS throttling counters."""
+    return jsonify(cpu_tuner.status()), 200
+
+
+@app.route("/cpu/retune", methods=["POST"])
+def retune_cpu():
+    """Re-reads the CPU quota now, e.g. right after a VPA resize."""
+    return jsonify(cpu_tuner.retune()), 200
+
+
 # --- Core Detection Logic ---
 
-def detect_one_frame(frame):
-    if frame is None:
-        return {"success": False, "error": "Invalid frame provided."}
+def extract_detections(boxes, names):
+    """
+    Converts one image's (N, 6) prediction tensor [x1, y1, x2, y2, conf, cls]
+    into a list of plain dicts, without going through a pandas DataFrame.
+    """
+    detections = []
+    for x1, y1, x2, y2, confidence, class_id in boxes.tolist():
+        class_id = int(class_id)
+        detections.append({
+            "box": [round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1)],
+            "confidence": round(confidence, 4),
+            "class_id": class_id,
+            "class_name": names[class_id],
+        })
+    return detections
+
+
+def summarize_detections(frame, detections, timings, input_shape):
+    """Builds the same summary text yolov5 prints, e.g. 'image 1/1: 2160x3840 6 persons'."""
+    counts = {}
+    for detection in detections:
+        counts[detection["class_name"]] = counts.get(detection["class_name"], 0) + 1
+    objects = ", ".join(f"{n} {name}{'s' * (n > 1)}" for name, n in counts.items())
+
+    height, width = frame.shape[:2]
+    preprocess_ms, inference_ms, nms_ms = timings
+    return (
+        f"image 1/1: {height}x{width} {objects or '(no detections)'}\n"
+        f"Speed: {preprocess_ms:.1f}ms pre-process, {inference_ms:.1f}ms inference, "
+        f"{nms_ms:.1f}ms NMS per image at shape {tuple(input_shape)}"
+    )
+
+
+def detect_frames(frames, size=INFERENCE_SIZE):
+    """
+    Runs a list of frames through the model in one call and returns one
+    result per frame. `size` is the longest side of the model input.
+    Timings are yolov5's per-image averages for the batch.
+    """
+    if any(frame is None for frame in frames):
+        return [{"success": False, "error": "Invalid frame provided."}] * len(frames)
 
     if MODEL_STATUS != "READY" or not model:
-        return {"success": False, "error": f"Model not ready. Status: {MODEL_STATUS}"}
+        return [{"success": False, "error": f"Model not ready. Status: {MODEL_STATUS}"}] * len(frames)
 
     try:
-        results = model(frame)
+        # AutoShape expects RGB; every backend gets the same input
+        rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+        with model_lock:
+            apply_worker_threads()
+            results = model(rgb_frames, size=size)
         preprocess_ms = results.t[0]
         inference_ms = results.t[1]
         nms_ms = results.t[2]
-        df = results.pandas().xyxy[0]
-        confidences = df["confidence"].tolist() if not df.empty else []
-        summary_string = str(results)
+
+        # Read boxes straight from the prediction tensors
+        postprocess_start = time.monotonic()
+        extracted = []
+        for frame, boxes in zip(frames, results.xyxy):
+            detections = extract_detections(boxes, results.names)
+            summary_string = summarize_detections(frame, detections, results.t, results.s)
+            extracted.append((detections, summary_string))
+        postprocess_ms = (time.monotonic() - postprocess_start) * 1000 / len(frames)
+
+        analysis = []
+        for detections, summary_string in extracted:
+            analysis.append({
+                "success": True,
+                "backend": INFERENCE_BACKEND,
+                "preprocess_ms": round(preprocess_ms, 2),
+                "inference_ms": round(inference_ms, 2),
+                "nms_ms": round(nms_ms, 2),
+                "postprocess_ms": round(postprocess_ms, 3),
+                "confidences": [detection["confidence"] for detection in detections],
+                "detections": detections,
+                "detections_summary": summary_string,
+            })
+        return analysis
+    except Exception as e:
+        print(f"{Colors.FAIL}Error during inference: {e}{Colors.ENDC}")
+        return [{"success": False, "error": f"Inference failed: {str(e)}"}] * len(frames)
+
+
+def tile_origins(length, tile_size, stride):
+    """Start offsets of tiles covering `length` pixels; the last tile ends flush with the edge."""
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+
+def detect_tiled(frame, size=INFERENCE_SIZE):
+    """
+    Splits the frame into overlapping TILE_SIZE tiles, runs all tiles through
+    the model in one call and merges their detections with a global NMS, so
+    small objects in large frames are not lost to downscaling. Per-tile
+    timings are yolov5's averages over the tile batch.
+    """
+    if frame is None:
+        return {"success": False, "error": "Invalid frame provided."}
+
+    if MODEL_STATUS != "READY" or not model:
+        return {"success": False, "error": f"Model not ready. Status: {MODEL_STATUS}"}
+
+    try:
+        height, width = frame.shape[:2]
+        stride = max(1, int(TILE_SIZE * (1 - TILE_OVERLAP)))
+        origins = [
+            (x, y)
+            for y in tile_origins(height, TILE_SIZE, stride)
+            for x in tile_origins(width, TILE_SIZE, stride)
+        ]
+        # RGB, as AutoShape expects
+        tiles = [cv2.cvtColor(frame[y:y + TILE_SIZE, x:x + TILE_SIZE], cv2.COLOR_BGR2RGB) for x, y in origins]
+
+        model_start = time.monotonic()
+        with model_lock:
+            apply_worker_threads()
+            results = model(tiles, size=size)
+        model_ms = (time.monotonic() - model_start) * 1000
+
+        # Shift each tile's boxes into frame coordinates, then suppress the
+        # duplicates found in the overlapping strips
+        merge_start = time.monotonic()
+        tile_boxes, per_tile = [], []
+        for (x, y), tile, boxes in zip(origins, tiles, results.xyxy):
+            boxes = boxes.clone()
+            boxes[:, [0, 2]] += x
+            boxes[:, [1, 3]] += y
+            tile_boxes.append(boxes)
+            per_tile.append({"origin": [x, y], "shape": list(tile.shape[:2]), "detections": len(boxes)})
+        boxes = torch.cat(tile_boxes)
+        kept = torchvision.ops.batched_nms(boxes[:, :4], boxes[:, 4], boxes[:, 5].long(), IOU_THRESHOLD)
+        detections = extract_detections(boxes[kept[:MAX_DETECTIONS]], results.names)
+        summary_string = summarize_detections(frame, detections, results.t, results.s)
+        merge_ms = (time.monotonic() - merge_start) * 1000
 
         return {
             "success": True,
-            "preprocess_ms": round(preprocess_ms, 2),
-            "inference_ms": round(inference_ms, 2),
-            "nms_ms": round(nms_ms, 2),
-            "confidences": confidences,
-            "detections_summary": summary_string.strip(),
+            "backend": INFERENCE_BACKEND,
+            "preprocess_ms": round(results.t[0], 2),
+            "inference_ms": round(results.t[1], 2),
+            "nms_ms": round(results.t[2], 2),
+            "postprocess_ms": round(merge_ms, 3),
+            "confidences": [detection["confidence"] for detection in detections],
+            "detections": detections,
+            "detections_summary": summary_string,
+            "tiling": {
+                "tile_size": TILE_SIZE,
+                "overlap": TILE_OVERLAP,
+                "tiles": len(tiles),
+                "per_tile_ms": {
+                    "preprocess": round(results.t[0], 2),
+                    "inference": round(results.t[1], 2),
+                    "nms": round(results.t[2], 2),
+                },
+                "per_tile": per_tile,
+                "detections_before_merge": len(boxes),
+                "model_ms": round(model_ms, 2),
+                "merge_ms": round(merge_ms, 3),
+                "total_ms": round(model_ms + merge_ms, 2),
+            },
         }
     except Exception as e:
-        print(f"{Colors.FAIL}Error during inference: {e}{Colors.ENDC}")
+        print(f"{Colors.FAIL}Error during tiled inference: {e}{Colors.ENDC}")
         return {"success": False, "error": f"Inference failed: {str(e)}"}
 
 
+def detect_one_frame(frame, size=INFERENCE_SIZE, tiled=False):
+    if tiled:
+        return detect_tiled(frame, size)
+    return detect_frames([frame], size)[0]
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file